@@ -0,0 +1,194 @@
+import json
+import threading
+import time
+
+from collections import deque
+
+import numpy as np
+import vosk
+
+from metrics import counter, histogram
+
+SAMPLE_RATE = 16000
+CHUNK_FRAMES = 4000  # 250 ms of 16-bit mono audio per read
+CHUNK_BYTES = CHUNK_FRAMES * 2
+
+AUDIO_CHUNKS = counter("pai_audio_chunks", "Audio chunks read from the input")
+AUDIO_DROPPED = counter("pai_audio_dropped_chunks", "Audio chunks overwritten because recognition fell behind")
+AUDIO_READ_ERRORS = counter("pai_audio_read_errors", "Failed reads from the audio input")
+VAD_SECONDS = histogram("pai_vad_seconds", "Voice activity detection time per chunk")
+WAKE_SECONDS = histogram("pai_wake_word_seconds", "Wake word recognizer time per chunk")
+ASR_SECONDS = histogram("pai_asr_seconds", "Command recognizer time per chunk")
+
+# ---------------- RING BUFFER ----------------
+class AudioRingBuffer:
+    # Fixed number of chunk-sized slots in one preallocated bytearray. If the
+    # reader falls behind, the oldest chunk is overwritten and counted as dropped
+    # instead of the capture thread blocking and the device overflowing.
+    def __init__(self, chunk_bytes=CHUNK_BYTES, capacity=64):
+        self.chunk_bytes = chunk_bytes
+        self.capacity = capacity
+        self.buffer = bytearray(chunk_bytes * capacity)
+        self.lengths = [0] * capacity
+        self.read_index = 0
+        self.write_index = 0
+        self.dropped = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def write(self, data):
+        with self.cond:
+            if self.write_index - self.read_index >= self.capacity:
+                self.read_index += 1
+                self.dropped += 1
+                AUDIO_DROPPED.inc()
+            slot = self.write_index % self.capacity
+            size = min(len(data), self.chunk_bytes)
+            start = slot * self.chunk_bytes
+            self.buffer[start:start + size] = data[:size]
+            self.lengths[slot] = size
+            self.write_index += 1
+            self.cond.notify()
+
+    def read(self, timeout=None):
+        # Returns the oldest chunk, or None on timeout or once closed and drained
+        with self.cond:
+            while self.read_index == self.write_index:
+                if self.closed or not self.cond.wait(timeout):
+                    return None
+            slot = self.read_index % self.capacity
+            start = slot * self.chunk_bytes
+            data = bytes(self.buffer[start:start + self.lengths[slot]])
+            self.read_index += 1
+            return data
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        with self.cond:
+            return self.write_index - self.read_index
+
+# ---------------- CAPTURE THREAD ----------------
+class AudioCaptureThread(threading.Thread):
+    # Does nothing but read the input device into the ring buffer, so the device
+    # is drained even while recognition, the LLM or TTS are busy. The source only
+    # needs a PyAudio-style read(frames, exception_on_overflow=False); an empty
+    # read means the source is exhausted.
+    def __init__(self, source, ring, chunk_frames=CHUNK_FRAMES, log=None):
+        super().__init__(daemon=True)
+        self.source = source
+        self.ring = ring
+        self.chunk_frames = chunk_frames
+        self.log = log or (lambda text: None)
+        self.read_errors = 0
+        self.chunks = 0
+        self.running = True
+
+    def run(self):
+        while self.running:
+            try:
+                data = self.source.read(self.chunk_frames, exception_on_overflow=False)
+            except Exception as e:
+                if not self.running:
+                    break
+                self.read_errors += 1
+                AUDIO_READ_ERRORS.inc()
+                self.log(f"Audio input error: {e}")
+                time.sleep(0.1)
+                continue
+            if not data:
+                break
+            self.chunks += 1
+            AUDIO_CHUNKS.inc()
+            self.ring.write(data)
+        self.ring.close()
+
+    def stop(self):
+        self.running = False
+
+# ---------------- VOICE ACTIVITY ----------------
+class EnergyVAD:
+    # Energy-based voice activity detection over int16 chunks. Each chunk is cut
+    # into frame_ms frames and counts as speech if any frame's RMS clears the
+    # noise floor by threshold_ratio. The floor is the quietest chunk over the
+    # last floor_window_ms, speech included, so steady background noise raises
+    # it within that window instead of holding the detector in speech forever.
+    # After speech, end_silence_ms of silence marks the end of the utterance;
+    # shorter pauses are still passed through so words are not cut apart.
+    def __init__(self, sample_rate=SAMPLE_RATE, chunk_frames=CHUNK_FRAMES, frame_ms=30,
+                 threshold_ratio=3.0, min_rms=300.0, end_silence_ms=750, floor_window_ms=5000):
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        chunk_ms = 1000 * chunk_frames / sample_rate
+        self.end_chunks = max(1, round(end_silence_ms / chunk_ms))
+        self.chunk_floors = deque(maxlen=max(1, round(floor_window_ms / chunk_ms)))
+        self.noise_floor = min_rms / threshold_ratio
+        self.in_speech = False
+        self.silent_chunks = 0
+        self.previous = None  # Kept as pre-roll so the start of a word is not lost
+        self.chunks = 0
+        self.speech_chunks = 0
+
+    def is_speech(self, data):
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        usable = len(samples) // self.frame * self.frame
+        if not usable:
+            return False
+        rms = np.sqrt((samples[:usable].reshape(-1, self.frame) ** 2).mean(axis=1))
+        # The quietest frames of a chunk with speech are the pauses between words
+        self.chunk_floors.append(float(np.percentile(rms, 10)))
+        self.noise_floor = min(self.chunk_floors)
+        return bool((rms > max(self.min_rms, self.noise_floor * self.threshold_ratio)).any())
+
+    def process(self, data):
+        # Returns (chunks to feed the recognizer, whether an utterance just ended)
+        with VAD_SECONDS.time():
+            return self.classify(data)
+
+    def classify(self, data):
+        self.chunks += 1
+        speech = self.is_speech(data)
+        chunks = []
+        ended = False
+        if speech:
+            if not self.in_speech and self.previous is not None:
+                chunks.append(self.previous)
+            self.in_speech = True
+            self.silent_chunks = 0
+            chunks.append(data)
+        elif self.in_speech:
+            self.silent_chunks += 1
+            chunks.append(data)
+            if self.silent_chunks >= self.end_chunks:
+                self.in_speech = False
+                ended = True
+        self.previous = None if self.in_speech else data
+        self.speech_chunks += len(chunks)
+        return chunks, ended
+
+# ---------------- WAKE WORD ----------------
+class WakeWordSpotter:
+    # Always-on first stage. The recognizer is restricted to a grammar of just
+    # the wake word and [unk], which is far cheaper than open-vocabulary
+    # decoding, and a match has to be a whole word ("hey" does not fire on "they").
+    def __init__(self, model, wake_word, sample_rate=SAMPLE_RATE):
+        self.wake_word = wake_word
+        self.rec = vosk.KaldiRecognizer(model, sample_rate, json.dumps([wake_word, "[unk]"]))
+
+    def accept(self, data):
+        with WAKE_SECONDS.time():
+            return self.spot(data)
+
+    def spot(self, data):
+        if self.rec.AcceptWaveform(data):
+            text = json.loads(self.rec.Result()).get("text", "")
+        else:
+            text = json.loads(self.rec.PartialResult()).get("partial", "")
+        if self.wake_word in text.lower().split():
+            self.rec.Reset()
+            return True
+        return False
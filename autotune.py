@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import platform
+from llama_cpp import Llama
+
+TUNING_PATH = "autotune.json"
+BENCH_TEXT = (
+    "You are a helpful voice assistant. Explain in a few sentences why the sky "
+    "is blue, how rainbows form and what causes the colours of a sunset. "
+)
+PROMPT_TOKENS = 300  # Typical prompt and reply size the settings are benchmarked and scored for
+REPLY_TOKENS = 60
+# n_ctx is left as configured: it barely changes speed but sets the KV cache
+# size per slot and per saved prompt state, which is what matters on a 2 GB Pi
+TUNED_KEYS = ("n_threads", "n_batch")
+
+# ---------------- AUTO-TUNER ----------------
+def machine_key(model_path):
+    # Tuned settings only hold for the same model on the same kind of machine
+    return f"{os.path.basename(model_path)}|{platform.machine()}|{os.cpu_count()}"
+
+def bench_tokens(llm, n_ctx, gen_tokens):
+    # A prompt of the length requests are scored for, shortened if the context cannot hold it
+    length = min(PROMPT_TOKENS, n_ctx - gen_tokens - 1)
+    text = "[INST] " + BENCH_TEXT * (length // 20 + 1)
+    return llm.tokenize(text.encode("utf-8"))[:length]
+
+def measure(model_path, n_ctx, n_threads, n_batch, gen_tokens=16):
+    # Returns (prompt tokens/sec, generated tokens/sec) for one setting
+    llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, n_batch=n_batch, verbose=False)
+    try:
+        tokens = bench_tokens(llm, n_ctx, gen_tokens)
+        llm.eval(tokens[:1])  # Pages the weights in before timing
+        llm.reset()
+        started = time.time()
+        llm.eval(tokens)
+        prompt_seconds = time.time() - started
+        generated = 0
+        started = time.time()
+        for token in llm.generate(tokens, top_k=1, temp=0.0):  # Reuses the evaluated prompt
+            generated += 1
+            if generated >= gen_tokens:
+                break
+        gen_seconds = time.time() - started
+        return len(tokens) / prompt_seconds, generated / gen_seconds
+    finally:
+        llm.close()
+
+def request_seconds(speeds):
+    prompt_tps, gen_tps = speeds
+    return PROMPT_TOKENS / prompt_tps + REPLY_TOKENS / gen_tps
+
+def tune(model_path, n_ctx, log=print):
+    # Tunes one setting at a time: threads first (they dominate generation speed),
+    # then the prompt batch size, both at the configured context size
+    cpus = os.cpu_count() or 1
+    thread_options = sorted({max(1, cpus // 2), max(1, cpus - 1), cpus} | {n for n in (1, 2, 4, 8) if n <= cpus})
+    batch_options = [64, 128, 256, 512]
+
+    def run(n_ctx, n_threads, n_batch):
+        try:
+            seconds = request_seconds(measure(model_path, n_ctx, n_threads, n_batch))
+        except Exception as e:
+            log(f"Auto-tune: n_ctx={n_ctx} n_threads={n_threads} n_batch={n_batch} failed: {e}")
+            return None
+        log(f"Auto-tune: n_ctx={n_ctx} n_threads={n_threads} n_batch={n_batch}: {seconds:.2f}s per request")
+        return seconds
+
+    results = {n: run(n_ctx, n, 512) for n in thread_options}
+    n_threads = min((n for n in results if results[n] is not None), key=results.get, default=cpus)
+    results = {b: run(n_ctx, n_threads, b) for b in batch_options}
+    n_batch = min((b for b in results if results[b] is not None), key=results.get, default=512)
+    return {"n_threads": n_threads, "n_batch": n_batch}
+
+def tuned_settings(model_path, n_ctx, run_if_missing=True, force=False, path=TUNING_PATH, log=print):
+    # Returns the persisted settings for this machine, benchmarking them on first use
+    tuned = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            tuned = json.load(f)
+    key = machine_key(model_path)
+    if not force and (key in tuned or not run_if_missing or not os.path.exists(model_path)):
+        return tuned.get(key, {})
+    log("Auto-tune: benchmarking this machine, this runs once...")
+    tuned[key] = tune(model_path, n_ctx, log)
+    with open(path, "w") as f:
+        json.dump(tuned, f, indent=2)
+    log(f"Auto-tune: using {tuned[key]}")
+    return tuned[key]
+
+def apply_tuning(config, log=print):
+    # Fills in tuned values for the settings the user did not set explicitly
+    if not config.get("auto_tune"):
+        return config
+    settings = tuned_settings(config["model_path"], config["n_ctx"], log=log)
+    for key, value in settings.items():
+        # Files written by older versions also hold an n_ctx, which is no longer applied
+        if key in TUNED_KEYS and key not in config.explicit:
+            config[key] = value
+    return config
+
+if __name__ == "__main__":
+    # Re-runs the benchmark, e.g. after a hardware change: python autotune.py [--model-path ...]
+    from config import load_config, SERVER_DEFAULTS
+    config = load_config(SERVER_DEFAULTS, "server")
+    tuned_settings(config["model_path"], config["n_ctx"], force=True)
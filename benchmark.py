@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import wave
+import queue
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+from audio_pipeline import SAMPLE_RATE
+from mock_llm import mock_factory
+from latency_stats import describe
+
+# End-to-end latency benchmark for main.py's voice pipeline.
+#
+#   python benchmark.py fixtures/*.wav --runs 5 --out bench_results.json
+#
+# Each fixture is a WAV recording of the wake word followed by a command, e.g.
+# "tara what time is it". It is played into VoiceAssistantWorker in place of
+# the microphone, followed by silence so the VAD sees the end of the utterance.
+# The Vosk model is real. The LLM is MockLlama unless --real-llm is given.
+# Speech goes to a stub engine unless --real-tts is given. Stages are timed as:
+#   wake          fixture start -> wake word detected
+#   asr_final     end of fixture audio -> command recognized
+#   prompt_eval   generation start -> first token
+#   first_token   end of fixture audio -> first token
+#   full_reply    end of fixture audio -> reply complete
+#   first_audio   end of fixture audio -> first sentence handed to TTS
+STAGES = {
+    "wake": ("start", "wake"),
+    "asr_final": ("speech_end", "command"),
+    "prompt_eval": ("generation_start", "first_token"),
+    "first_token": ("speech_end", "first_token"),
+    "full_reply": ("speech_end", "reply_done"),
+    "first_audio": ("speech_end", "first_audio"),
+}
+
+# ---------------- AUDIO SOURCE ----------------
+def load_wav(path, sample_rate=SAMPLE_RATE):
+    # Returns 16-bit mono PCM at sample_rate, downmixing and resampling if needed
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit WAV files are supported")
+        channels, rate = f.getnchannels(), f.getframerate()
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate:
+        positions = np.arange(0, len(samples), rate / sample_rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+    return samples.astype(np.int16).tobytes()
+
+class WavSource:
+    # PyAudio-style input stream. Fixtures queued with play() are delivered at
+    # speed x real time, each followed by tail_seconds of silence. Between
+    # fixtures read() blocks, as a quiet microphone would. on_speech_end fires
+    # when the last fixture chunk has been read.
+    def __init__(self, sample_rate=SAMPLE_RATE, speed=1.0, tail_seconds=1.5):
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.tail = bytes(int(sample_rate * tail_seconds) * 2)
+        self.fixtures = queue.Queue()
+        self.data = b""
+        self.position = 0
+        self.speech_bytes = 0
+        self.on_speech_end = None
+
+    def play(self, pcm, on_speech_end=None):
+        self.fixtures.put((pcm, on_speech_end))
+
+    def read(self, frames, exception_on_overflow=False):
+        size = frames * 2
+        if self.position >= len(self.data):
+            item = self.fixtures.get()
+            if item is None:
+                return b""
+            pcm, self.on_speech_end = item
+            self.data = pcm + self.tail
+            self.speech_bytes = len(pcm)
+            self.position = 0
+        chunk = self.data[self.position:self.position + size]
+        self.position += size
+        if self.on_speech_end is not None and self.position >= self.speech_bytes:
+            self.on_speech_end()
+            self.on_speech_end = None
+        time.sleep(frames / self.sample_rate / self.speed)
+        return chunk.ljust(size, b"\0")
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        self.fixtures.put(None)
+
+# ---------------- STUB TTS ----------------
+class StubSpeechEngine:
+    # Stands in for pyttsx3, "speaking" at a fixed rate without a sound device
+    def __init__(self, chars_per_second=15.0):
+        self.chars_per_second = chars_per_second
+        self.text = ""
+        self.stopped = threading.Event()
+
+    def setProperty(self, name, value):
+        pass
+
+    def say(self, text):
+        self.text = text
+        self.stopped.clear()
+
+    def runAndWait(self):
+        self.stopped.wait(len(self.text) / self.chars_per_second)
+
+    def stop(self):
+        self.stopped.set()
+
+# ---------------- CONSOLE LOG ----------------
+class ConsoleLog:
+    # Stands in for the GUI's LogSink and prints worker log lines as they come
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+
+    def info(self, text):
+        if self.verbose:
+            print(f"  {text}")
+
+    def error(self, text):
+        print(f"  error: {text}")
+
+# ---------------- HARNESS ----------------
+class Turn:
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.times = {}
+        self.done = threading.Event()
+
+    def mark(self, stage):
+        self.times.setdefault(stage, time.time())
+        if "reply_done" in self.times and "first_audio" in self.times:
+            self.done.set()
+
+    def durations(self):
+        return {
+            name: round(self.times[end] - self.times[start], 4)
+            for name, (start, end) in STAGES.items()
+            if start in self.times and end in self.times
+        }
+
+def summarize(turns):
+    stages = {}
+    for name in STAGES:
+        values = [turn["durations"][name] for turn in turns if name in turn["durations"]]
+        if values:
+            stages[name] = describe(values)
+    return stages
+
+def git_version():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_benchmark(args):
+    import main
+
+    # Mock replies must never reach the user's persisted cache, and clearing between turns must not wipe it
+    main.RESPONSE_CACHE_PATH = None
+    if not args.cache:
+        main.SEMANTIC_CACHE_MODEL = ""
+    fixtures = [(path, load_wav(path)) for path in args.fixtures]
+    source = WavSource(speed=args.speed)
+    current = {"turn": None}
+
+    def trace(stage):
+        turn = current["turn"]
+        if turn is not None:
+            turn.mark(stage)
+
+    signals = main.WorkerSignals()
+    llm_factory = main.Llama if args.real_llm else mock_factory(args.prompt_token_ms / 1000, args.token_ms / 1000)
+    worker = main.VoiceAssistantWorker(
+        signals, args.model_path, args.vosk_model_path, log_sink=ConsoleLog(args.verbose),
+        audio_source=source, llm_factory=llm_factory,
+        speech_engine=None if args.real_tts else StubSpeechEngine, trace=trace,
+    )
+    worker.start()
+    if not worker.model_ready.wait(args.timeout):
+        raise RuntimeError("Model did not load in time")
+
+    turns = []
+    for run in range(args.runs):
+        worker.conversation_history.clear()
+        for path, pcm in fixtures:
+            if not args.cache:
+                worker.cache.clear()
+            turn = Turn(path)
+            current["turn"] = turn
+            turn.mark("start")
+            source.play(pcm, on_speech_end=lambda turn=turn: turn.mark("speech_end"))
+            completed = turn.done.wait(args.timeout)
+            current["turn"] = None
+            worker.tts.cancel()
+            result = {"run": run, "fixture": os.path.basename(path), "completed": completed,
+                      "durations": turn.durations()}
+            turns.append(result)
+            print(f"run {run + 1}/{args.runs} {result['fixture']}: "
+                  + (", ".join(f"{k} {v:.3f}s" for k, v in result["durations"].items()) or "no stages reached"))
+            time.sleep(args.pause)
+    worker.stop()
+    source.close()
+    return turns
+
+def compare(stages, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["stages"]
+    print(f"\nChange against {baseline_path} (p50 / p95):")
+    for name, stats in stages.items():
+        if name in baseline:
+            old = baseline[name]
+            print(f"  {name:12s} {stats['p50'] - old['p50']:+.3f}s / {stats['p95'] - old['p95']:+.3f}s")
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark for the voice pipeline")
+    parser.add_argument("fixtures", nargs="+", help="WAV files with the wake word followed by a command")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--speed", type=float, default=1.0, help="audio playback speed, 1.0 is real time")
+    parser.add_argument("--pause", type=float, default=0.5, help="seconds between turns")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds before a turn counts as failed")
+    parser.add_argument("--real-llm", action="store_true", help="use the GGUF model instead of MockLlama")
+    parser.add_argument("--real-tts", action="store_true", help="speak through pyttsx3")
+    parser.add_argument("--cache", action="store_true", help="keep response caches enabled between turns")
+    parser.add_argument("--prompt-token-ms", type=float, default=2.0, help="MockLlama prompt eval cost per token")
+    parser.add_argument("--token-ms", type=float, default=20.0, help="MockLlama cost per generated token")
+    parser.add_argument("--model-path", default="mistral-7b-instruct-v0.2.Q3_K_L.gguf")
+    parser.add_argument("--vosk-model-path", default="vosk-model-small-en-us-0.15")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    turns = run_benchmark(args)
+    stages = summarize([turn for turn in turns if turn["completed"]])
+    results = {
+        "version": git_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": f"{platform.machine()} x{os.cpu_count()}",
+        "llm": "real" if args.real_llm else f"mock ({args.prompt_token_ms} ms/prompt token, {args.token_ms} ms/token)",
+        "runs": args.runs,
+        "failures": sum(not turn["completed"] for turn in turns),
+        "stages": stages,
+        "turns": turns,
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'stage':12s} {'p50':>8s} {'p95':>8s} {'p99':>8s}")
+    for name, stats in stages.items():
+        print(f"{name:12s} {stats['p50']:8.3f} {stats['p95']:8.3f} {stats['p99']:8.3f}")
+    print(f"{results['failures']} failed turn(s), results written to {args.out}")
+    if args.baseline:
+        compare(stages, args.baseline)
+
+if __name__ == "__main__":
+    main_cli()
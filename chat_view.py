@@ -0,0 +1,273 @@
+import json
+import os
+
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRectF, QSize, QTimer
+from PySide6.QtGui import QColor, QFontMetrics, QGuiApplication, QPainter
+
+CHAT_RETENTION = 500  # Messages kept in memory, older ones are paged out to the archive file
+CHAT_PAGE = 100  # Messages brought back from the archive when scrolling past the top
+CHAT_ARCHIVE_PATH = "chat_archive.jsonl"  # Rewritten every start, the conversation itself lives in the worker
+FONT_POINT_SIZE = 14
+BUBBLE_PADDING = 10
+BUBBLE_MARGIN = 5
+BUBBLE_WIDTH = 0.8  # Share of the view a bubble may take
+STREAMING_CURSOR = " |"
+
+ROLE_ROLE = Qt.UserRole
+STREAMING_ROLE = Qt.UserRole + 1
+
+# ---------------- ARCHIVE ----------------
+class ChatArchive:
+    # Append-only JSON lines of messages that left the model. Byte offsets of
+    # every line are kept so a page can be read back without scanning the file.
+    def __init__(self, path=CHAT_ARCHIVE_PATH):
+        self.path = path
+        self.offsets = []
+        self.file = open(path, "w+", encoding="utf-8")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, messages):
+        self.file.seek(0, os.SEEK_END)
+        for role, text in messages:
+            self.offsets.append(self.file.tell())
+            self.file.write(json.dumps([role, text]) + "\n")
+        self.file.flush()
+
+    def read(self, start, end):
+        self.file.seek(self.offsets[start])
+        return [tuple(json.loads(self.file.readline())) for _ in range(start, end)]
+
+    def close(self):
+        self.file.close()
+
+# ---------------- MODEL ----------------
+class ChatModel(QAbstractListModel):
+    # Rows are (role, text) pairs. first_index is the position of row 0 in the
+    # whole conversation; everything before it, and possibly some loaded rows,
+    # is in the archive.
+    def __init__(self, archive, retention=CHAT_RETENTION, parent=None):
+        super().__init__(parent)
+        self.archive = archive
+        self.retention = retention
+        self.messages = []
+        self.first_index = 0
+        self.streaming_row = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        msg_role, text = self.messages[index.row()]
+        if role == Qt.DisplayRole:
+            return text
+        if role == ROLE_ROLE:
+            return msg_role
+        if role == STREAMING_ROLE:
+            return index.row() == self.streaming_row
+        return None
+
+    def append(self, role, text):
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append((role, text))
+        self.endInsertRows()
+        return row
+
+    def set_text(self, row, text):
+        self.messages[row] = (self.messages[row][0], text)
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def trim(self):
+        # Drops the oldest rows beyond the retention cap, archiving the ones not archived yet
+        extra = len(self.messages) - self.retention
+        if extra <= 0 or self.streaming_row is not None and self.streaming_row < extra:
+            return
+        unarchived = max(0, self.first_index + extra - len(self.archive))
+        if unarchived:
+            self.archive.append(self.messages[extra - unarchived:extra])
+        self.beginRemoveRows(QModelIndex(), 0, extra - 1)
+        del self.messages[:extra]
+        self.first_index += extra
+        if self.streaming_row is not None:
+            self.streaming_row -= extra
+        self.endRemoveRows()
+
+    def load_older(self, count=CHAT_PAGE):
+        # Prepends up to count archived messages and returns how many there were
+        count = min(count, self.first_index)
+        if not count:
+            return 0
+        start = self.first_index - count
+        self.beginInsertRows(QModelIndex(), 0, count - 1)
+        self.messages[:0] = self.archive.read(start, self.first_index)
+        self.first_index = start
+        if self.streaming_row is not None:
+            self.streaming_row += count
+        self.endInsertRows()
+        return count
+
+# ---------------- DELEGATE ----------------
+class ChatDelegate(QStyledItemDelegate):
+    # Paints one bubble per row. Only rows in the viewport are painted, so the
+    # cost of a repaint does not grow with the length of the conversation.
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.dark = True
+
+    def colors(self, role):
+        if role == "user":
+            return QColor("#0b6ff7"), QColor("white")
+        if self.dark:
+            return QColor("#ff8a1f"), QColor("white")
+        return QColor("#3ff6c8"), QColor("black")
+
+    def font(self, option):
+        font = option.font
+        font.setPointSize(FONT_POINT_SIZE)
+        return font
+
+    def text_rect(self, option, text):
+        # The option rect is not set up yet in sizeHint, so widths come from the viewport
+        width = int(self.view.viewport().width() * BUBBLE_WIDTH) - 2 * (BUBBLE_PADDING + BUBBLE_MARGIN)
+        metrics = QFontMetrics(self.font(option))
+        return metrics.boundingRect(0, 0, max(width, 50), 100000, Qt.TextWordWrap, text)
+
+    def display_text(self, index):
+        text = index.data(Qt.DisplayRole)
+        return text + STREAMING_CURSOR if index.data(STREAMING_ROLE) else text
+
+    def sizeHint(self, option, index):
+        rect = self.text_rect(option, self.display_text(index))
+        return QSize(self.view.viewport().width(), rect.height() + 2 * (BUBBLE_PADDING + BUBBLE_MARGIN))
+
+    def paint(self, painter, option, index):
+        text = self.display_text(index)
+        role = index.data(ROLE_ROLE)
+        text_rect = self.text_rect(option, text)
+        width = text_rect.width() + 2 * BUBBLE_PADDING
+        height = text_rect.height() + 2 * BUBBLE_PADDING
+        top = option.rect.top() + BUBBLE_MARGIN
+        if role == "user":
+            left = option.rect.right() - BUBBLE_MARGIN - width
+        else:
+            left = option.rect.left() + BUBBLE_MARGIN
+        background, foreground = self.colors(role)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(background)
+        painter.drawRoundedRect(QRectF(left, top, width, height), 10, 10)
+        painter.setPen(foreground)
+        painter.setFont(self.font(option))
+        painter.drawText(QRectF(left + BUBBLE_PADDING, top + BUBBLE_PADDING, text_rect.width(), text_rect.height()),
+                         Qt.TextWordWrap, text)
+        painter.restore()
+
+# ---------------- VIEW ----------------
+class ChatView(QListView):
+    # Chat transcript for both GUIs. Streamed tokens only store the latest text;
+    # a timer running at the screen's refresh rate repaints the streaming row,
+    # so a fast model costs one repaint per frame instead of one per token. The
+    # view follows new messages only while it is scrolled to the bottom.
+    def __init__(self, retention=CHAT_RETENTION, archive_path=CHAT_ARCHIVE_PATH, parent=None):
+        super().__init__(parent)
+        self.archive = ChatArchive(archive_path)
+        self.chat_model = ChatModel(self.archive, retention, self)
+        self.chat_delegate = ChatDelegate(self)
+        self.setModel(self.chat_model)
+        self.setItemDelegate(self.chat_delegate)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setResizeMode(QListView.Adjust)
+        self.setLayoutMode(QListView.Batched)
+        self.setWordWrap(True)
+        self.setUniformItemSizes(False)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.verticalScrollBar().valueChanged.connect(self.on_scroll)
+
+        self.pending_text = None
+        self.follow = True
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 60.0
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(max(1, int(1000 / (refresh_rate or 60.0))))
+        self.flush_timer.timeout.connect(self.flush_partial)
+
+    def at_bottom(self):
+        scrollbar = self.verticalScrollBar()
+        return scrollbar.value() >= scrollbar.maximum() - 4
+
+    def on_scroll(self, value):
+        self.follow = self.at_bottom()
+        if value == self.verticalScrollBar().minimum() and self.chat_model.first_index:
+            # Keep the row that was on top in place while older messages are added above it
+            loaded = self.chat_model.load_older()
+            if loaded:
+                self.scrollTo(self.chat_model.index(loaded), QAbstractItemView.PositionAtTop)
+
+    def append_message(self, text, role):
+        self.finish_partial()
+        follow = self.follow or role == "user"
+        self.chat_model.append(role, text)
+        if follow:
+            self.chat_model.trim()
+            self.scroll_to_end()
+
+    def update_partial(self, text):
+        # Starts a streaming bubble on the first call of a reply; later calls replace its text
+        if self.chat_model.streaming_row is None:
+            self.append_message(text, "bot")
+            self.chat_model.streaming_row = self.chat_model.rowCount() - 1
+            return
+        self.pending_text = text
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush_partial(self):
+        row = self.chat_model.streaming_row
+        if row is None or self.pending_text is None:
+            return
+        follow = self.follow
+        self.chat_model.set_text(row, self.pending_text)
+        self.pending_text = None
+        self.relayout(row)
+        if follow:
+            self.scroll_to_end()
+
+    def finish_partial(self):
+        # Ends the streaming bubble, showing the last text it was given without the cursor
+        self.flush_timer.stop()
+        self.flush_partial()
+        row = self.chat_model.streaming_row
+        if row is not None:
+            self.chat_model.streaming_row = None
+            index = self.chat_model.index(row)
+            self.chat_model.dataChanged.emit(index, index)
+            self.relayout(row)
+
+    def relayout(self, row):
+        # dataChanged only repaints; the list view re-queries the row's height on sizeHintChanged
+        self.chat_delegate.sizeHintChanged.emit(self.chat_model.index(row))
+
+    def scroll_to_end(self):
+        # Lays out pending height changes first, or the scroll stops at the old bottom
+        self.executeDelayedItemsLayout()
+        self.scrollToBottom()
+        self.follow = True
+
+    def set_dark(self, dark):
+        self.chat_delegate.dark = dark
+        self.viewport().update()
+
+    def close_archive(self):
+        self.flush_timer.stop()
+        self.archive.close()
@@ -2,170 +2,265 @@ import sys
 import os
 import threading
 import json
-import requests
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import time
+import uuid
 
-from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QLineEdit, QPushButton, QLabel, QTabWidget, QScrollArea, QSplitter
+from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel, QTabWidget, QSplitter
 from PySide6.QtCore import Qt, Signal, QObject, QTimer
 import itertools
-import pyttsx3
 import pyaudio
 import vosk
 
+from tts_pipeline import SpeechPipeline
+from response_cache import ResponseCache
+from semantic_cache import load_semantic_cache
+from host_client import HostClient, HostError, RequestCancelled
+from audio_pipeline import AudioRingBuffer, AudioCaptureThread, EnergyVAD, WakeWordSpotter, SAMPLE_RATE, CHUNK_FRAMES, CHUNK_BYTES, ASR_SECONDS
+from metrics_panel import MetricsPanel
+from chat_view import ChatView
+from log_sink import LogSink, LogView
+
 WAKE_WORD = "hey"
 END_WORD = "over"
-HOST_URL = "http://192.168.1.15:5005/generate"  # Change to your server IP
+HOST_URLS = ["http://192.168.1.15:5005"]  # Change to your server IPs; requests are balanced across them
+HOST_TRANSPORT = "http"  # "http" posts each turn, "socketio" streams over one persistent connection per host
+HOST_RETRIES = 3  # Attempts after the first one, before any token has arrived
+HEALTH_CHECK_INTERVAL = 15.0
+RESPONSE_CACHE_PATH = "response_cache.sqlite3"  # Warm replies survive restarts
+RESPONSE_CACHE_CONTEXT_TURNS = 1  # Previous exchanges that are part of the cache key
+SEMANTIC_CACHE_MODEL = ""  # Optional GGUF embedding model, e.g. a small MiniLM/bge; empty disables
+SEMANTIC_CACHE_THRESHOLD = 0.92  # Cosine similarity needed to reuse a reply
+RING_CHUNKS = 40  # 10 s of audio buffered between capture and recognition
+COMMAND_TIMEOUT = 8.0  # Seconds of silence after the wake word before going back to wake word spotting
+CHAT_RETENTION = 500  # Chat messages kept in the window, older ones are paged to disk
+LOG_FILE = ""  # Optional rotating copy of the Log tab, e.g. "client.log"; empty keeps the log in memory only
 
 # ---------------- SIGNALS ----------------
 class WorkerSignals(QObject):
-    log = Signal(str)
     response = Signal(str)
     partial_response = Signal(str)
-    error = Signal(str)
     typing = Signal(bool)
-    connection = Signal(str)  # Signal for connection logs
 
 # ---------------- VOICE ASSISTANT WORKER ----------------
 class VoiceAssistantWorker(threading.Thread):
-    def __init__(self, signals, vosk_model_path):
+    def __init__(self, signals, vosk_model_path, log_sink=None, connection_sink=None):
         super().__init__(daemon=True)
         self.signals = signals
+        # Log lines go straight into the thread-safe sinks the Log and Connection tabs drain on their timers
+        log_sink = log_sink or LogSink()
+        self.log = log_sink.info
+        self.log_error = log_sink.error
+        self.log_connection = (connection_sink or LogSink()).info
         self.vosk_model_path = vosk_model_path
         self.running = True
         self.conversation_history = []
-        self.cache = {}  
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
-        self.engine.setProperty('volume', 1.0)
-        self.tts_lock = threading.Lock()
+        self.session_id = uuid.uuid4().hex  # Server keeps the history for this id
+        self.host = self.create_host_client()
+        self.command_generation = 0
+        self.cache = ResponseCache(RESPONSE_CACHE_PATH, context_turns=RESPONSE_CACHE_CONTEXT_TURNS)
+        self.semantic_cache = None  # Built by load_semantic_model; disabled until then
+        self.tts = SpeechPipeline(log=self.log, rate=150, volume=1.0)
         self.load_vosk_model()
         self.pa = pyaudio.PyAudio()
         self.stream = None
         self.rec = None
+        self.ring = AudioRingBuffer(CHUNK_BYTES, RING_CHUNKS)
+        self.vad = None
+        self.capture = None
+        self.commands = ThreadPoolExecutor(max_workers=1, thread_name_prefix="command")  # Handles commands in order, off the audio path
 
     def load_vosk_model(self):
         if not os.path.exists(self.vosk_model_path):
-            self.signals.log.emit("Vosk model not found. Please download and place it in models/")
+            self.log("Vosk model not found. Please download and place it in models/")
             raise FileNotFoundError("Vosk model not found")
         self.vosk_model = vosk.Model(self.vosk_model_path)
-        self.signals.log.emit("Vosk model loaded.")
+        self.log("Vosk model loaded.")
+
+    def load_semantic_model(self):
+        self.semantic_cache = load_semantic_cache(SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD, log=self.log)
+
+    def create_host_client(self):
+        if HOST_TRANSPORT == "socketio":
+            from socket_client import SocketHostClient
+            return SocketHostClient(HOST_URLS, retries=HOST_RETRIES, log=self.log_connection)
+        return HostClient(HOST_URLS, retries=HOST_RETRIES, log=self.log_connection)
 
     def run(self):
         try:
+            # The embedding model loads in the background so the window and the microphone are not held up
+            threading.Thread(target=self.load_semantic_model, daemon=True).start()
             self.stream = self.pa.open(
-                rate=16000,
+                rate=SAMPLE_RATE,
                 channels=1,
                 format=pyaudio.paInt16,
                 input=True,
                 frames_per_buffer=8000
             )
-            self.rec = vosk.KaldiRecognizer(self.vosk_model, 16000)
-            self.signals.log.emit(f"Listening for wake word '{WAKE_WORD}'...")
+            self.host.start_health_checks(HEALTH_CHECK_INTERVAL)
+            # Capture has its own thread so audio keeps flowing while a command is handled
+            self.capture = AudioCaptureThread(self.stream, self.ring, CHUNK_FRAMES, log=self.log)
+            self.capture.start()
+            # The full recognizer is only created and fed once the wake word fires
+            wake = WakeWordSpotter(self.vosk_model, WAKE_WORD, SAMPLE_RATE)
+            # Silent chunks never reach either recognizer
+            self.vad = EnergyVAD(SAMPLE_RATE, CHUNK_FRAMES)
+            self.log(f"Listening for wake word '{WAKE_WORD}'...")
             listening_for_command = False
+            listening_since = 0.0
+            reported_drops = 0
 
             while self.running:
-                data = self.stream.read(4000, exception_on_overflow=False)
-                if self.rec.AcceptWaveform(data):
-                    result = json.loads(self.rec.Result())
-                    text = result.get('text', '').strip().lower()
-                    if WAKE_WORD in text:
-                        self.signals.log.emit("Wake word detected!")
-                        listening_for_command = True
-                    elif listening_for_command:
-                        command = text.replace(WAKE_WORD, "").strip()
-                        if command:
-                            self.signals.log.emit(f"Command: {command}")
-                            if command == END_WORD:
-                                self.signals.log.emit("Conversation ended by user.")
-                                listening_for_command = False
-                                self.conversation_history.clear()
-                                continue
-                            self.signals.typing.emit(True)
-                            response = self.process_command(command)
-                            self.signals.typing.emit(False)
-                            self.signals.response.emit(response)
-                            self.speak(response)
-                            listening_for_command = False
-                else:
-                    partial = json.loads(self.rec.PartialResult())
-                    partial_text = partial.get('partial', '').strip().lower()
-                    if WAKE_WORD in partial_text and not listening_for_command:
-                        self.signals.log.emit("Wake word detected in partial!")
+                data = self.ring.read(timeout=0.5)
+                if data is None:
+                    if self.ring.closed:
+                        break
+                    continue
+                if self.ring.dropped != reported_drops:
+                    self.log(f"Audio: {self.ring.dropped - reported_drops} chunks dropped, recognition fell behind")
+                    reported_drops = self.ring.dropped
+
+                chunks, utterance_ended = self.vad.process(data)
+
+                if not listening_for_command:
+                    if any(wake.accept(chunk) for chunk in chunks):
+                        self.log("Wake word detected!")
+                        self.tts.cancel()
                         listening_for_command = True
+                        listening_since = time.time()
+                        if self.rec is None:
+                            self.rec = vosk.KaldiRecognizer(self.vosk_model, SAMPLE_RATE)
+                        else:
+                            self.rec.Reset()
+                        # The command may start in the same chunk as the wake word
+                        self.rec.AcceptWaveform(data)
+                    continue
+
+                result = None
+                for chunk in chunks:
+                    with ASR_SECONDS.time():
+                        if self.rec.AcceptWaveform(chunk):
+                            result = json.loads(self.rec.Result())
+                if self.vad.in_speech:
+                    listening_since = time.time()
+                timed_out = time.time() - listening_since > COMMAND_TIMEOUT
+                # End the command on real silence instead of waiting for Vosk's endpointing
+                if result is None and (utterance_ended or timed_out):
+                    result = json.loads(self.rec.FinalResult())
+                if result is None:
+                    continue
+
+                words = result.get('text', '').strip().lower().split()
+                command = " ".join(word for word in words if word != WAKE_WORD)
+                if command:
+                    self.log(f"Command: {command}")
+                    listening_for_command = False
+                    if command == END_WORD:
+                        self.log("Conversation ended by user.")
+                        self.commands.submit(self.reset_session)
+                        continue
+                    self.dispatch(command)
+                elif timed_out:
+                    self.log("No command heard, listening for wake word again.")
+                    listening_for_command = False
         except Exception as e:
-            self.signals.error.emit(str(e))
+            self.log_error(str(e))
+
+    def dispatch(self, command):
+        # A new command supersedes the one in flight and any still queued
+        self.command_generation += 1
+        self.host.cancel()
+        self.commands.submit(self.handle_command, command, self.command_generation)
+
+    def handle_command(self, command, generation):
+        if generation != self.command_generation:
+            return
+        self.signals.typing.emit(True)
+        self.process_command(command)
+        self.signals.typing.emit(False)
 
     def process_command(self, command):
+        # Streams the reply into partial_response and the speech pipeline, returns the final text
+        self.tts.begin()
+        reply = self.cache.get(command, self.conversation_history)
+        self.log(f"Response cache: {self.cache.summary()}")
+        if reply is None and self.semantic_cache is not None:
+            match = self.semantic_cache.get(command, self.conversation_history)
+            if match is not None:
+                reply, score = match
+                self.log(f"Semantic cache match ({score:.2f}) for command: {command}")
+        if reply is not None:
+            self.show_reply(reply)
+            return reply
+
         try:
-            if command in self.cache:
-                return self.cache[command]
-
-            try:
-                self.signals.connection.emit(f"Sending command to host: {command}")
-                response = requests.post(HOST_URL, json={
-                    "input": command,
-                    "history": self.conversation_history
-                }, timeout=30)
-                self.signals.connection.emit("Host responded successfully. Connection OK")
-            except Exception as e:
-                self.signals.connection.emit(f"Connection failed: {str(e)}")
-                return f"Connection failed: {str(e)}"
-
-            data = response.json()
-            if "response" in data:
-                reply = data["response"]
-                self.conversation_history.append(("user", command))
-                self.conversation_history.append(("assistant", reply))
-                self.cache[command] = reply
-                return reply
-            else:
-                return f"Error: {data.get('error','Unknown error')}"
+            reply = self.stream_from_host(command)
+        except RequestCancelled:
+            self.log_connection(f"Cancelled request for: {command}")
+            self.tts.cancel()
+            return None
+        except HostError as e:
+            self.log_connection(str(e))
+            reply = str(e)
         except Exception as e:
-            return f"Host request failed: {str(e)}"
+            reply = f"Host request failed: {str(e)}"
+        else:
+            self.cache.put(command, reply, self.conversation_history)
+            if self.semantic_cache is not None:
+                self.semantic_cache.put(command, reply, self.conversation_history)
+            self.conversation_history.append(("user", command))
+            self.conversation_history.append(("assistant", reply))
+            del self.conversation_history[:-40]
+            self.tts.end()
+            return reply
+
+        self.show_reply(reply)
+        return reply
+
+    def show_reply(self, reply):
+        self.signals.partial_response.emit(reply)
+        self.tts.feed(reply)
+        self.tts.end()
+
+    def stream_from_host(self, command):
+        self.log_connection(f"Sending command to host: {command}")
+        reply = ""
+
+        def on_token(token):
+            nonlocal reply
+            reply += token
+            self.signals.partial_response.emit(reply)
+            self.tts.feed(token)
+
+        event = self.host.stream_generate(
+            {"input": command, "session_id": self.session_id}, on_token,
+            history=self.conversation_history
+        )
+        return event.get("response", reply.strip())
+
+    def reset_session(self):
+        self.conversation_history.clear()
+        old_session = self.session_id
+        self.session_id = uuid.uuid4().hex
+        self.host.delete_session(old_session)
 
     def speak(self, text):
-        with self.tts_lock:
-            self.engine.say(text)
-            self.engine.runAndWait()
+        self.tts.say(text)
 
     def stop(self):
         self.running = False
+        self.host.cancel()
+        if self.capture:
+            self.capture.stop()
+        self.ring.close()
+        self.commands.shutdown(wait=False)
+        self.tts.stop()
+        self.cache.close()
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
         self.pa.terminate()
 
-# ---------------- COMMAND PROCESSOR THREAD ----------------
-class CommandProcessorThread(threading.Thread):
-    def __init__(self, worker, command, signals):
-        super().__init__(daemon=True)
-        self.worker = worker
-        self.command = command
-        self.signals = signals
-
-    def run(self):
-        import time
-        self.signals.typing.emit(True)
-        full_response = None
-
-        def request_server():
-            nonlocal full_response
-            full_response = self.worker.process_command(self.command)
-
-        request_thread = threading.Thread(target=request_server, daemon=True)
-        request_thread.start()
-
-        while request_thread.is_alive():
-            self.signals.partial_response.emit("Waiting for server response...")
-            time.sleep(0.5)
-
-        self.signals.typing.emit(False)
-
-        if full_response:
-            self.signals.partial_response.emit("")
-            self.signals.response.emit(full_response)
-            threading.Thread(target=self.worker.speak, args=(full_response,), daemon=True).start()
-
 # ---------------- GUI ----------------
 class AssistantGUI(QWidget):
     def __init__(self):
@@ -175,6 +270,7 @@ class AssistantGUI(QWidget):
         self.setMinimumSize(600, 400)
 
         self.typing_label = QLabel("")
+        self.chat_view = None  # Created in init_ui, apply_theme runs before that
         self.dark_theme = True
         self.apply_theme()
 
@@ -190,24 +286,24 @@ class AssistantGUI(QWidget):
         self.typing_label.setStyleSheet("font-style: italic; color: #00ffff; font-size: 16pt; padding: 5px;")
 
         self.signals = WorkerSignals()
-        self.signals.log.connect(self.append_log)
         self.signals.response.connect(self.append_response)
         self.signals.partial_response.connect(self.append_partial_response)
-        self.signals.error.connect(self.append_log)
         self.signals.typing.connect(self.show_typing)
-        self.signals.connection.connect(self.append_connection_log)
 
         self.init_ui()
         vosk_model_path = "vosk-model-small-en-us-0.15"
-        self.worker = VoiceAssistantWorker(self.signals, vosk_model_path)
+        self.worker = VoiceAssistantWorker(self.signals, vosk_model_path, log_sink=self.log_tab.sink,
+                                           connection_sink=self.connection_tab.sink)
         self.worker.start()
         self.load_conversation_history()
 
     def apply_theme(self):
+        if self.chat_view is not None:
+            self.chat_view.set_dark(self.dark_theme)
         if self.dark_theme:
             self.setStyleSheet("""
                 QWidget { background: #0f1115; color: #e6eef2; }
-                QLineEdit, QTextEdit { background: #121419; border-radius: 10px; padding: 8px; color: #e6eef2; }
+                QLineEdit, QTextEdit, QPlainTextEdit { background: #121419; border-radius: 10px; padding: 8px; color: #e6eef2; }
                 QPushButton { background: #00d1a1; color: #04201b; border-radius: 10px; padding: 10px; }
                 QPushButton:hover { background: #00b388; }
                 QTabWidget::pane { background: #121419; border-radius: 12px; }
@@ -217,7 +313,7 @@ class AssistantGUI(QWidget):
         else:
             self.setStyleSheet("""
                 QWidget { background: #f7f9fb; color: #222; }
-                QLineEdit, QTextEdit { background: #fff; border-radius: 10px; padding: 8px; color: #222; }
+                QLineEdit, QTextEdit, QPlainTextEdit { background: #fff; border-radius: 10px; padding: 8px; color: #222; }
                 QPushButton { background: #00796b; color: white; border-radius: 10px; padding: 10px; }
                 QPushButton:hover { background: #004d40; }
                 QTabWidget::pane { background: #fff; border-radius: 12px; }
@@ -261,13 +357,9 @@ class AssistantGUI(QWidget):
 
         chat_widget = QWidget()
         chat_layout = QVBoxLayout(chat_widget)
-        self.messages_scroll = QScrollArea()
-        self.messages_scroll.setWidgetResizable(True)
-        self.messages_container = QWidget()
-        self.messages_layout = QVBoxLayout(self.messages_container)
-        self.messages_layout.setAlignment(Qt.AlignTop)
-        self.messages_scroll.setWidget(self.messages_container)
-        chat_layout.addWidget(self.messages_scroll)
+        self.chat_view = ChatView(CHAT_RETENTION)
+        self.chat_view.set_dark(self.dark_theme)
+        chat_layout.addWidget(self.chat_view)
 
         self.typing_label = QLabel("")
         self.typing_label.setStyleSheet("font-style: italic; color: #9aa3ad; padding: 5px;")
@@ -294,54 +386,29 @@ class AssistantGUI(QWidget):
         side_layout = QVBoxLayout(side_widget)
         self.side_tabs = QTabWidget()
 
-        self.log_tab = QTextEdit()
-        self.log_tab.setReadOnly(True)
-        self.connection_tab = QTextEdit()
-        self.connection_tab.setReadOnly(True)
-        self.connection_tab.append("Connection logs will appear here...")
+        self.log_tab = LogView(LogSink(file_path=LOG_FILE))
+        self.connection_tab = LogView(placeholder="Connection logs will appear here...")
 
         self.side_tabs.addTab(self.log_tab, "Log")
         self.side_tabs.addTab(self.connection_tab, "Connection")
+        self.side_tabs.addTab(MetricsPanel(), "Metrics")
 
         side_layout.addWidget(self.side_tabs)
         main_splitter.addWidget(side_widget)
         main_splitter.setStretchFactor(1, 1)
 
     def append_message(self, text, msg_type):
-        msg = QLabel(text)
-        msg.setWordWrap(True)
-        font = msg.font()
-        font.setPointSize(14)
-        msg.setFont(font)
-        if msg_type == 'user':
-            msg.setStyleSheet("background: linear-gradient(90deg,#0b6ff7,#1a9bff); color: white; padding: 10px; border-radius: 10px; margin: 5px; font-size: 14pt;")
-        else:
-            if self.dark_theme:
-                msg.setStyleSheet("background: linear-gradient(90deg,#ff9f43,#ff6f00); color: white; padding: 10px; border-radius: 10px; margin: 5px; font-size: 14pt;")
-            else:
-                msg.setStyleSheet("background: linear-gradient(90deg,#0fffd0,#70f2c3); color: black; padding: 10px; border-radius: 10px; margin: 5px; font-size: 14pt;")
-        self.messages_layout.addWidget(msg)
-        QTimer.singleShot(0, lambda: self.messages_scroll.verticalScrollBar().setValue(self.messages_scroll.verticalScrollBar().maximum()))
-
-    def append_log(self, text):
-        timestamp = datetime.now().strftime("[%H:%M:%S]")
-        self.log_tab.append(f"{timestamp} {text}")
+        self.chat_view.append_message(text, msg_type)
 
-    def append_connection_log(self, text):
-        timestamp = datetime.now().strftime("[%H:%M:%S]")
-        self.connection_tab.append(f"{timestamp} {text}")
+    def append_error(self, text):
+        self.log_tab.error(text)
 
     def append_response(self, text):
         self.append_message(text, 'bot')
 
     def append_partial_response(self, text):
-        if self.messages_layout.count() == 0:
-            self.append_message(text + " |", 'bot')
-        else:
-            last_msg = self.messages_layout.itemAt(self.messages_layout.count() - 1).widget()
-            if last_msg:
-                last_msg.setText(text + " |")
-        QTimer.singleShot(0, lambda: self.messages_scroll.verticalScrollBar().setValue(self.messages_scroll.verticalScrollBar().maximum()))
+        # One bubble per reply; it is created by the first token of the stream
+        self.chat_view.update_partial(text)
 
     def load_conversation_history(self):
         for msg in self.worker.conversation_history:
@@ -352,28 +419,23 @@ class AssistantGUI(QWidget):
         try:
             if self.typing_label is not None:
                 if is_typing:
+                    self.chat_view.finish_partial()
                     self.typing_animation_timer.start()
                     self.bot_loading_label.setText("Loading...")
                 else:
                     self.typing_animation_timer.stop()
                     self.typing_label.setText("")
                     self.bot_loading_label.setText("")
-                    if self.messages_layout.count() > 0:
-                        last_msg = self.messages_layout.itemAt(self.messages_layout.count() - 1).widget()
-                        if last_msg:
-                            text = last_msg.text()
-                            if text.endswith(" |"):
-                                last_msg.setText(text[:-2])
+                    self.chat_view.finish_partial()
         except Exception as e:
-            self.append_log(f"Error in show_typing: {str(e)}")
+            self.append_error(f"Error in show_typing: {str(e)}")
 
     def send_message(self):
         text = self.message_input.text().strip()
         if text:
             self.append_message(text, 'user')
             self.message_input.clear()
-            thread = CommandProcessorThread(self.worker, text, self.signals)
-            thread.start()
+            self.worker.dispatch(text)
 
     def update_typing_animation(self):
         next_text = next(self.typing_animation_iterator)
@@ -381,6 +443,9 @@ class AssistantGUI(QWidget):
 
     def closeEvent(self, event):
         self.worker.stop()
+        self.chat_view.close_archive()
+        self.log_tab.close_sink()
+        self.connection_tab.close_sink()
         event.accept()
 
 # ------------------ MAIN ------------------
@@ -0,0 +1,112 @@
+import os
+import json
+import argparse
+
+CONFIG_PATH = os.environ.get("PAI_CONFIG", "pai_config.json")
+ENV_PREFIX = "PAI_"
+
+# Every key can be set in the config file, as PAI_<KEY> or as --<key>
+INFERENCE_DEFAULTS = {
+    "model_path": "mistral-7b-instruct-v0.2.Q3_K_L.gguf",
+    "n_ctx": 1024,
+    "n_threads": 4,
+    "n_batch": 512,
+    "max_tokens": 150,
+    "temperature": 0.8,
+    "context_budget": 0,  # prompt tokens, 0 means n_ctx - max_tokens
+    "summarize": False,  # fold dropped turns into a summary
+    "prompt_cache_mb": 1024,  # saved KV states for earlier turns
+    "mmap": True,  # map the GGUF so pages load on demand and are shared
+    "mlock": False,  # pin weights in RAM, needs a raised memlock limit
+    "auto_tune": False,  # benchmark threads and batch size on first start and reuse the result
+}
+
+SERVER_DEFAULTS = dict(
+    INFERENCE_DEFAULTS,
+    slots=1,  # Llama contexts serving requests in parallel
+    max_queue=8,  # waiting requests before 429
+    session_ttl=1800,  # seconds a session survives without requests
+    max_sessions=256,
+    draft="",  # speculative decoding: "" off, "lookup", or a small GGUF sharing the vocabulary
+    draft_tokens=10,  # tokens proposed per draft
+    host="0.0.0.0",
+    port=5005,
+    serve="dev",  # "dev" runs Flask's server, "eventlet" the evented production server
+    request_timeout=120,  # seconds a request may wait and generate before it is cancelled
+    shutdown_grace=30,  # seconds in-flight requests get to finish on SIGTERM/SIGINT
+    mock_llm=False,  # serve MockLlama instead of the GGUF, to profile everything but the model
+    mock_prompt_token_ms=2.0,  # MockLlama prompt eval cost per token
+    mock_token_ms=20.0,  # MockLlama cost per generated token
+)
+
+ASSISTANT_DEFAULTS = dict(
+    INFERENCE_DEFAULTS,
+    n_threads=2,  # Optimized for RPi4 2GB RAM
+    prompt_cache_mb=256,
+    vosk_model_path="vosk-model-small-en-us-0.15",
+    chat_retention=500,  # chat messages kept in the window, older ones are paged to disk
+    log_file="",  # rotating copy of the Log tab, empty keeps the log in memory only
+)
+
+# ---------------- CONFIG ----------------
+class Config(dict):
+    # Settings merged from defaults, the JSON config file, PAI_* environment
+    # variables and command line flags, later sources winning. explicit holds
+    # the keys that were set anywhere but the defaults, so auto-tuned values
+    # never override something the user chose.
+    def __init__(self, values, explicit):
+        super().__init__(values)
+        self.explicit = explicit
+
+def parse_value(default, text):
+    if isinstance(default, bool):
+        if text.lower() in ("1", "true", "yes", "on"):
+            return True
+        if text.lower() in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(f"Expected a boolean, got {text!r}")
+    if isinstance(default, int):
+        return int(text)
+    if isinstance(default, float):
+        return float(text)
+    if isinstance(default, list):
+        return [item.strip() for item in text.split(",") if item.strip()]
+    return text
+
+def load_file(path, section):
+    # Top-level keys apply to every entry point, a section ("server", "assistant") overrides them
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    values = {key: value for key, value in data.items() if not isinstance(value, dict)}
+    values.update(data.get(section, {}))
+    return values
+
+def load_config(defaults, section, argv=None, path=CONFIG_PATH):
+    values = dict(defaults)
+    explicit = set()
+
+    for key, value in load_file(path, section).items():
+        if key in defaults:
+            values[key] = value
+            explicit.add(key)
+
+    for key, default in defaults.items():
+        text = os.environ.get(ENV_PREFIX + key.upper())
+        if text is not None:
+            values[key] = parse_value(default, text)
+            explicit.add(key)
+
+    # Unknown arguments are left alone, Qt has its own
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    for key, default in defaults.items():
+        parser.add_argument("--" + key.replace("_", "-"), dest=key, default=None)
+    args, _ = parser.parse_known_args(argv)
+    for key, default in defaults.items():
+        text = getattr(args, key)
+        if text is not None:
+            values[key] = parse_value(default, text)
+            explicit.add(key)
+
+    return Config(values, explicit)
@@ -0,0 +1,124 @@
+import time
+from collections import OrderedDict
+
+PROMPT_PREFIX = "[INST]"  # every prompt starts with this, summaries included
+
+SUMMARY_PROMPT = (
+    "[INST] Summarize the following conversation in at most three sentences. "
+    "Keep names, facts and open questions.\n\n{transcript} [/INST]"
+)
+
+def format_message(role, content):
+    if role == "user":
+        return f"[INST] {content} [/INST]"
+    return f"{content}</s>"
+
+def format_summary(summary):
+    return f"[INST] Summary of our earlier conversation: {summary} [/INST]Okay.</s>"
+
+# ---------------- CONTEXT MANAGER ----------------
+class ContextManager:
+    # Builds [INST] prompts that stay within budget tokens. When history overflows,
+    # whole turns are dropped from the front until it is back under keep_ratio of
+    # the budget, so the prompt prefix (and the KV state cached for it) stays the
+    # same for several turns instead of shifting every turn. With summarize on,
+    # the dropped turns are folded into a cached rolling summary.
+    def __init__(self, llm, budget, summarize=False, summary_tokens=96, keep_ratio=0.6, max_memo=4096):
+        self.llm = llm
+        self.budget = budget
+        self.summarize = summarize
+        self.summary_tokens = summary_tokens
+        self.keep_ratio = keep_ratio
+        self.max_memo = max_memo
+        self.token_counts = OrderedDict()  # formatted message -> token count
+        self.summaries = OrderedDict()  # dropped messages -> summary text
+        self.dropped = 0
+        self.prompt_tokens = 0
+
+    def warm_up(self):
+        # Evaluates the shared prompt prefix once. This pages the mmapped weights
+        # in and allocates compute buffers before the first request, and the
+        # prefix stays in the KV cache for it. Returns the seconds it took.
+        started = time.time()
+        self.llm.reset()
+        self.llm.eval(self.llm.tokenize(PROMPT_PREFIX.encode("utf-8")))
+        return time.time() - started
+
+    def count_tokens(self, text):
+        count = self.token_counts.get(text)
+        if count is None:
+            count = len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+            self.token_counts[text] = count
+            if len(self.token_counts) > self.max_memo:
+                self.token_counts.popitem(last=False)
+        else:
+            self.token_counts.move_to_end(text)
+        return count
+
+    def build_prompt(self, history, user_input):
+        current = format_message("user", user_input)
+        reserve = 1  # BOS
+        if self.summarize:
+            reserve += self.count_tokens(format_summary("")) + self.summary_tokens
+
+        costs = [self.count_tokens(format_message(role, content)) for role, content in history]
+        start = self.window_start(history, costs, self.budget - reserve)
+
+        # A long current input can still push the window over; trim further
+        total = sum(costs[start:])
+        limit = self.budget - reserve - self.count_tokens(current)
+        while start < len(history) and (total > limit or history[start][0] != "user"):
+            total -= costs[start]
+            start += 1
+
+        self.dropped = start
+        self.prompt_tokens = total + self.count_tokens(current) + 1
+        prompt = "".join(format_message(role, content) for role, content in history[start:]) + current
+        if start and self.summarize:
+            summary = self.summary_for(history[:start])
+            if summary:
+                prompt = format_summary(summary) + prompt
+                self.prompt_tokens += reserve - 1
+        return prompt
+
+    def window_start(self, history, costs, budget):
+        # Replays the conversation turn by turn, so the same history always
+        # yields the same cut points
+        low_water = int(budget * self.keep_ratio)
+        start, total = 0, 0
+        for i, cost in enumerate(costs):
+            total += cost
+            if total > budget:
+                while start <= i and (total > low_water or history[start][0] != "user"):
+                    total -= costs[start]
+                    start += 1
+        return start
+
+    def summary_for(self, dropped):
+        key = tuple(tuple(message) for message in dropped)
+        if key in self.summaries:
+            self.summaries.move_to_end(key)
+            return self.summaries[key]
+
+        # Extend the summary of the longest already-summarized prefix
+        previous, done = "", 0
+        for cached_key, summary in self.summaries.items():
+            if done < len(cached_key) <= len(key) and key[:len(cached_key)] == cached_key:
+                previous, done = summary, len(cached_key)
+
+        lines = [f"Earlier summary: {previous}"] if previous else []
+        for role, content in key[done:]:
+            lines.append(f"{'User' if role == 'user' else 'Assistant'}: {content}")
+        try:
+            output = self.llm(
+                SUMMARY_PROMPT.format(transcript="\n".join(lines)),
+                max_tokens=self.summary_tokens, stop=["</s>"], echo=False
+            )
+            summary = output['choices'][0]['text'].strip()
+        except Exception:
+            return previous
+
+        self.summaries[key] = summary
+        if len(self.summaries) > 16:
+            self.summaries.popitem(last=False)
+        return summary
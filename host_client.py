@@ -0,0 +1,271 @@
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import counter, histogram, TRACER
+
+HOST_FIRST_TOKEN = histogram("pai_host_first_token_seconds", "Request sent to the host's first token, per attempt")
+HOST_REQUEST_SECONDS = histogram("pai_host_request_seconds", "Whole remote request including retries")
+HOST_HEALTH_RTT = histogram("pai_host_health_rtt_seconds", "Round trip of a /health check")
+HOST_RETRIES = counter("pai_host_retries", "Remote attempts retried, by reason")
+
+class HostError(Exception):
+    pass
+
+class RequestCancelled(HostError):
+    pass
+
+class SessionLost(HostError):
+    # The host no longer holds the session (TTL, eviction or restart)
+    pass
+
+class RetryableError(HostError):
+    def __init__(self, message, retry_after=None, host_failed=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.host_failed = host_failed
+
+# ---------------- HOST STATE ----------------
+class HostState:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.outstanding = 0
+        self.latency = None  # Smoothed /health round trip, seconds
+        self.first_token = None  # Smoothed time to first token of real replies, seconds
+        self.failures = 0
+        self.down_until = 0.0
+
+    def available(self, now):
+        return now >= self.down_until
+
+    def record_latency(self, seconds):
+        self.latency = seconds if self.latency is None else 0.7 * self.latency + 0.3 * seconds
+
+    def record_first_token(self, seconds):
+        self.first_token = seconds if self.first_token is None else 0.7 * self.first_token + 0.3 * seconds
+
+    def record_success(self):
+        self.failures = 0
+        self.down_until = 0.0
+
+    def record_failure(self):
+        # Passive health: back off from a failing host for 2, 4, 8 ... up to 60 s
+        self.failures += 1
+        self.down_until = time.time() + min(2 ** self.failures, 60)
+
+# ---------------- HOST CLIENT ----------------
+class HostClient:
+    # All traffic to server.py goes through one pooled keep-alive Session, so a
+    # command no longer pays a fresh TCP connect. Requests go to the host with
+    # the fewest outstanding requests, then the fastest first token and round
+    # trip, and a session sticks to the host that served it so its KV/prefix
+    # cache stays warm. Failed connects mark the host down and fail over to the next one;
+    # 429s and 5xx answers are retried with exponential backoff. Retries stop
+    # once the first token arrives, since a retry would repeat text the user
+    # already saw.
+    def __init__(self, base_urls, timeout=30, retries=3, backoff=0.5, pool_size=4, log=None):
+        if isinstance(base_urls, str):
+            base_urls = [base_urls]
+        self.hosts = [HostState(url) for url in base_urls]
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.log = log or (lambda text: None)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.hosts), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.sticky = {}  # session id -> HostState that holds the session
+        self.current = None  # Response being streamed
+        self.cancelled = False
+        self.healthy = None
+        self.health_thread = None
+
+    def pick_host(self, session_id=None):
+        with self.lock:
+            now = time.time()
+            host = self.sticky.get(session_id)
+            if host is not None and host.available(now):
+                return host
+            candidates = [h for h in self.hosts if h.available(now)]
+            if not candidates:
+                # Everything is marked down; try whichever comes back first
+                return min(self.hosts, key=lambda h: h.down_until)
+            return min(candidates, key=lambda h: (h.outstanding, h.first_token or 0.0, h.latency or 0.0))
+
+    def backoff_delay(self, attempt, retry_after=None):
+        if retry_after:
+            return min(float(retry_after), 10.0)
+        return min(self.backoff * 2 ** attempt, 8.0) * (0.5 + random.random() / 2)
+
+    def stream_generate(self, payload, on_token, history=None):
+        # Calls on_token for each streamed token and returns the final "done" event.
+        # history lets a host that does not know the session yet rebuild it; it is
+        # sent, even empty, whenever the session moves to a host or was lost.
+        with self.lock:
+            self.cancelled = False
+        with HOST_REQUEST_SECONDS.time(), TRACER.span("host.request"):
+            return self.attempt_hosts(payload, on_token, history)
+
+    def attempt_hosts(self, payload, on_token, history):
+        session_id = payload.get("session_id")
+        attempt = 0
+        resend = False
+        while True:
+            host = self.pick_host(session_id)
+            request = dict(payload, stream=True)
+            if history is not None and (resend or self.sticky.get(session_id) is not host):
+                request["history"] = [list(entry) for entry in history]
+            try:
+                event = self.stream_once(host, request, on_token)
+            except SessionLost:
+                if resend:
+                    raise HostError("Error: Host refused the session history")
+                self.log(f"{host.base_url}: session expired, resending the history")
+                with self.lock:
+                    self.sticky.pop(session_id, None)
+                resend = True
+                continue
+            except RetryableError as e:
+                if e.host_failed:
+                    host.record_failure()
+                if attempt >= self.retries:
+                    raise HostError(str(e))
+                attempt += 1
+                failover = e.host_failed and any(h.available(time.time()) for h in self.hosts)
+                HOST_RETRIES.labels(reason="failover" if failover else "retry").inc()
+                if failover:
+                    self.log(f"{host.base_url}: {e}, failing over ({attempt}/{self.retries})")
+                else:
+                    delay = self.backoff_delay(attempt - 1, e.retry_after)
+                    self.log(f"{host.base_url}: {e}, retrying in {delay:.1f}s ({attempt}/{self.retries})")
+                    time.sleep(delay)
+                if self.cancelled:
+                    raise RequestCancelled("Request cancelled")
+                continue
+            host.record_success()
+            if session_id:
+                with self.lock:
+                    self.sticky[session_id] = host
+            return event
+
+    def stream_once(self, host, request, on_token):
+        started = time.time()
+        with self.lock:
+            host.outstanding += 1
+        try:
+            try:
+                response = self.session.post(
+                    f"{host.base_url}/generate", json=request,
+                    stream=True, timeout=(5, self.timeout)
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                raise RetryableError(f"Connection failed: {e}", host_failed=True)
+
+            with self.lock:
+                if self.cancelled:
+                    response.close()
+                    raise RequestCancelled("Request cancelled")
+                self.current = response
+
+            first_token = True
+            try:
+                with response:
+                    if response.status_code == 429:
+                        raise RetryableError("Host busy", response.headers.get("Retry-After"))
+                    if response.status_code >= 500:
+                        raise RetryableError(f"Host error {response.status_code}", host_failed=True)
+                    if response.status_code == 409:
+                        raise SessionLost("Unknown session")
+                    if response.status_code != 200:
+                        raise HostError(f"Error: {response.json().get('error', 'Unknown error')}")
+                    self.log(f"{host.base_url} responded. Connection OK")
+
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line or not line.startswith("data: "):
+                            continue
+                        event = json.loads(line[len("data: "):])
+                        if "error" in event:
+                            raise HostError(f"Error: {event['error']}")
+                        if "token" in event:
+                            if first_token:
+                                HOST_FIRST_TOKEN.observe(time.time() - started)
+                                host.record_first_token(time.time() - started)
+                                self.log(f"First token after {time.time() - started:.2f}s")
+                                first_token = False
+                            on_token(event["token"])
+                        elif event.get("done"):
+                            self.log(f"Reply complete after {time.time() - started:.2f}s")
+                            return event
+                raise HostError("Error: Host closed the stream before the reply was complete")
+            except HostError:
+                raise
+            except Exception as e:
+                # cancel() closes the response under us, which surfaces here as a read error
+                if self.cancelled:
+                    raise RequestCancelled("Request cancelled")
+                if first_token:
+                    raise RetryableError(f"Connection failed: {e}", host_failed=True)
+                raise HostError(f"Connection lost: {e}")
+        finally:
+            with self.lock:
+                host.outstanding -= 1
+                self.current = None
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.current is not None:
+                self.current.close()
+
+    def delete_session(self, session_id):
+        with self.lock:
+            host = self.sticky.pop(session_id, None)
+        if host is None:
+            return
+        try:
+            self.session.delete(f"{host.base_url}/sessions/{session_id}", timeout=5)
+        except requests.RequestException as e:
+            self.log(f"Could not end session on {host.base_url}: {e}")
+
+    def health(self, host):
+        # Returns the host's /health payload with the round trip time, or None if unreachable
+        started = time.time()
+        try:
+            response = self.session.get(f"{host.base_url}/health", timeout=5)
+            data = response.json()
+        except (requests.RequestException, ValueError):
+            return None
+        data["latency"] = time.time() - started
+        HOST_HEALTH_RTT.observe(data["latency"])
+        return data
+
+    def check_hosts(self):
+        for host in self.hosts:
+            data = self.health(host)
+            if data is not None and data.get("status") == "ok":
+                host.record_latency(data["latency"])
+                if host.failures:
+                    self.log(f"{host.base_url} is back ({data['latency'] * 1000:.0f} ms)")
+                host.record_success()
+            elif host.available(time.time()):
+                self.log(f"{host.base_url} unreachable or not ready")
+                host.record_failure()
+        healthy = any(host.available(time.time()) for host in self.hosts)
+        if healthy != self.healthy:
+            self.log("Hosts healthy" if healthy else "No host reachable")
+            self.healthy = healthy
+
+    def start_health_checks(self, interval=15.0):
+        def check():
+            while True:
+                self.check_hosts()
+                time.sleep(interval)
+
+        self.health_thread = threading.Thread(target=check, daemon=True)
+        self.health_thread.start()
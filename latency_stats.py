@@ -0,0 +1,22 @@
+# ---------------- LATENCY STATS ----------------
+def percentile(values, p):
+    # Linear interpolation between the closest ranks
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+def describe(values):
+    # Count, mean and tail percentiles of a list of durations, in the same units
+    if not values:
+        return None
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+    }
@@ -0,0 +1,185 @@
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import datetime
+
+import requests
+
+from latency_stats import describe
+
+# Load generator for server.py's POST /generate.
+#
+#   python server.py --mock-llm true --slots 2        # no model file needed
+#   python loadtest.py --url http://127.0.0.1:5005 --sessions 8 --duration 60
+#
+# Each simulated session is a thread with its own keep-alive connection that
+# sends streamed requests back to back, with think time in between. By default
+# the server keeps the history (session_id). With --stateless every request
+# carries the full history instead, --history-turns of it to begin with. Reported:
+# throughput, time to first token and total latency percentiles, queueing delay
+# (from the server's reply metrics) and error, 429 and timeout rates.
+UTTERANCES = [
+    "what is the weather like tomorrow",
+    "set a timer for ten minutes",
+    "tell me a short joke",
+    "how far is the moon from the earth",
+    "remind me to call my sister tonight",
+    "what should I cook for dinner with rice and beans",
+    "explain how a heat pump works in simple terms",
+    "play some relaxing music",
+]
+FILLER_REPLY = "Sure, here is what I found. It should only take a moment and I can give more detail if you like."
+
+# ---------------- RESULTS ----------------
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.outcomes = {}  # outcome -> count
+        self.first_token = []
+        self.total = []
+        self.queue = []
+        self.tokens = 0
+
+    def record(self, outcome, first_token=None, total=None, queue=None, tokens=0):
+        with self.lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if outcome == "ok":
+                self.first_token.append(first_token)
+                self.total.append(total)
+                self.tokens += tokens
+                if queue is not None:
+                    self.queue.append(queue)
+
+    def report(self, seconds):
+        requests_done = sum(self.outcomes.values())
+        ok = self.outcomes.get("ok", 0)
+
+        def rate(outcome):
+            return round(self.outcomes.get(outcome, 0) / requests_done, 4) if requests_done else 0.0
+
+        return {
+            "requests": requests_done,
+            "ok": ok,
+            "seconds": round(seconds, 2),
+            "requests_per_second": round(ok / seconds, 3),
+            "tokens_per_second": round(self.tokens / seconds, 2),
+            "error_rate": round(1 - ok / requests_done, 4) if requests_done else 0.0,
+            "busy_rate": rate("busy"),  # 429 answers, the client backs off for Retry-After
+            "timeout_rate": rate("timeout"),
+            "outcomes": dict(self.outcomes),
+            "first_token_seconds": describe(self.first_token),
+            "total_seconds": describe(self.total),
+            "queue_seconds": describe(self.queue),
+        }
+
+# ---------------- SESSIONS ----------------
+def fake_history(turns):
+    history = []
+    for _ in range(turns):
+        history.append(["user", random.choice(UTTERANCES)])
+        history.append(["assistant", FILLER_REPLY])
+    return history
+
+def stream_request(http, url, payload, timeout):
+    # Returns (outcome, first token seconds, total seconds, done event or 429 details)
+    started = time.time()
+    first_token = None
+    try:
+        with http.post(f"{url}/generate", json=payload, stream=True, timeout=(5, timeout)) as response:
+            if response.status_code == 429:
+                return "busy", None, None, {"retry_after": float(response.headers.get("Retry-After", 1))}
+            if response.status_code == 504:
+                return "timeout", None, None, None
+            if response.status_code == 409:
+                return "session_lost", None, None, None
+            if response.status_code != 200:
+                return f"http_{response.status_code}", None, None, None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                if "error" in event:
+                    return ("timeout" if "timed out" in event["error"] else "error"), None, None, None
+                if "token" in event and first_token is None:
+                    first_token = time.time() - started
+                if event.get("done"):
+                    return "ok", first_token or 0.0, time.time() - started, event
+        return "incomplete", None, None, None
+    except requests.Timeout:
+        return "timeout", None, None, None
+    except requests.RequestException:
+        return "connection_error", None, None, None
+
+def run_session(args, results, stop_at):
+    http = requests.Session()
+    session_id = uuid.uuid4().hex
+    seeded = False
+    history = fake_history(args.history_turns)
+    while time.time() < stop_at:
+        utterance = random.choice(UTTERANCES)
+        payload = {"input": utterance, "stream": True, "max_tokens": args.max_tokens}
+        if args.stateless:
+            payload["history"] = history
+        else:
+            payload["session_id"] = session_id
+            if not seeded:
+                payload["history"] = history  # seeds the server-side session
+        outcome, first_token, total, event = stream_request(http, args.url, payload, args.timeout)
+        metrics = (event or {}).get("metrics", {})
+        results.record(outcome, first_token, total, metrics.get("queue_seconds"), metrics.get("tokens", 0))
+        if outcome == "ok":
+            seeded = True
+            history = history + [["user", utterance], ["assistant", event["response"]]]
+            history = history[-2 * args.max_history_turns:]
+        if outcome == "session_lost":
+            seeded = False  # expired or evicted on the server, the next request reseeds it
+        if outcome == "busy":
+            # Back off like a well-behaved client instead of hammering a full queue
+            time.sleep(min(event["retry_after"], max(0.0, stop_at - time.time())))
+        time.sleep(random.uniform(0, 2 * args.think_time))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test server.py's /generate endpoint")
+    parser.add_argument("--url", default="http://127.0.0.1:5005")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent simulated clients")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to keep sending requests")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which sessions start")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between a session's requests")
+    parser.add_argument("--history-turns", type=int, default=3, help="history each session starts with")
+    parser.add_argument("--max-history-turns", type=int, default=20, help="history cap for stateless sessions")
+    parser.add_argument("--stateless", action="store_true", help="send the full history instead of a session id")
+    parser.add_argument("--max-tokens", type=int, default=60)
+    parser.add_argument("--timeout", type=float, default=120.0, help="client-side read timeout per request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = Results()
+    started = time.time()
+    stop_at = started + args.duration
+    threads = []
+    for index in range(args.sessions):
+        thread = threading.Thread(target=run_session, args=(args, results, stop_at), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp_up / args.sessions)
+    for thread in threads:
+        thread.join()
+
+    report = dict(results.report(time.time() - started), sessions=args.sessions, url=args.url,
+                  stateless=args.stateless, timestamp=datetime.now().isoformat(timespec="seconds"))
+    try:
+        report["server_stats"] = requests.get(f"{args.url}/stats", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        pass
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
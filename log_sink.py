@@ -0,0 +1,171 @@
+import logging
+import logging.handlers
+import threading
+import time
+from collections import deque
+
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QPlainTextEdit, QComboBox
+from PySide6.QtCore import QTimer
+
+LOG_CAPACITY = 2000  # Lines kept in the ring buffer and in the widget
+LOG_FLUSH_MS = 250  # Pending lines are written to the widget in one batch this often
+LOG_FILE_FLUSH_SECONDS = 1.0  # Pending lines are written to the log file this often, off the GUI thread
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+LEVELS = {"All": logging.INFO, "Errors only": logging.ERROR}
+
+# ---------------- LOG SINK ----------------
+class LogSink:
+    # Thread-safe ring buffer of (sequence, time, level, text) records. Worker
+    # threads write to it directly; writing is an append under a lock, and
+    # formatting and filtering happen when a reader drains the buffer, in
+    # batches. With a file_path a background thread writes new lines to a
+    # rotating file. When more than capacity lines arrive between two drains
+    # the oldest are dropped and the reader is told how many it missed.
+    def __init__(self, capacity=LOG_CAPACITY, file_path="", file_level=logging.INFO):
+        self.records = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.file_level = file_level
+        self.logger = None
+        if file_path:
+            handler = logging.handlers.RotatingFileHandler(
+                file_path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            self.logger = logging.getLogger(f"pai.{file_path}")
+            self.logger.propagate = False
+            self.logger.setLevel(file_level)
+            self.logger.addHandler(handler)
+        self.written = 0  # last sequence number sent to the file
+        self.file_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.file_thread = None
+        if self.logger is not None:
+            self.file_thread = threading.Thread(target=self.file_loop, daemon=True)
+            self.file_thread.start()
+
+    def write(self, text, level=logging.INFO):
+        with self.lock:
+            self.sequence += 1
+            self.records.append((self.sequence, time.time(), level, text))
+
+    def info(self, text):
+        self.write(text, logging.INFO)
+
+    def error(self, text):
+        self.write(text, logging.ERROR)
+
+    def since(self, sequence):
+        # Records newer than sequence and how many of those were already dropped
+        with self.lock:
+            if not self.records or self.records[-1][0] <= sequence:
+                return [], 0
+            first = self.records[0][0]
+            records = [record for record in self.records if record[0] > sequence]
+        return records, max(0, first - sequence - 1)
+
+    def file_loop(self):
+        while not self.stopped.wait(LOG_FILE_FLUSH_SECONDS):
+            self.flush_file()
+
+    def flush_file(self):
+        if self.logger is None:
+            return
+        with self.file_lock:
+            records, dropped = self.since(self.written)
+            if dropped:
+                self.logger.warning(f"{dropped} log lines dropped")
+            for _, _, level, text in records:
+                if level >= self.file_level:
+                    self.logger.log(level, text)
+            if records:
+                self.written = records[-1][0]
+
+    def close(self):
+        self.stopped.set()
+        if self.file_thread is not None:
+            self.file_thread.join()
+        self.flush_file()
+        if self.logger is not None:
+            for handler in list(self.logger.handlers):
+                handler.close()
+                self.logger.removeHandler(handler)
+
+def format_records(records, level):
+    # One string for a batch; the time stamp is formatted once per second, not once per line
+    lines = []
+    last_second = None
+    stamp = ""
+    for _, created, record_level, text in records:
+        if record_level < level:
+            continue
+        second = int(created)
+        if second != last_second:
+            stamp = time.strftime("[%H:%M:%S]", time.localtime(created))
+            last_second = second
+        lines.append(f"{stamp} {text}")
+    return "\n".join(lines)
+
+# ---------------- LOG VIEW ----------------
+class LogView(QWidget):
+    # Level filter over a QPlainTextEdit capped at the sink's capacity. Workers
+    # write to the sink, not through queued signals; a timer appends whatever
+    # arrived since the last tick in one call, so the GUI thread does the same
+    # work per tick however chatty the log is. The view only displays lines,
+    # the sink writes its own file.
+    def __init__(self, sink=None, placeholder="", parent=None):
+        super().__init__(parent)
+        self.sink = sink or LogSink()
+        self.shown = 0  # last sequence number appended to the widget
+        self.level = logging.INFO
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.level_box = QComboBox()
+        self.level_box.addItems(list(LEVELS))
+        self.level_box.currentTextChanged.connect(self.set_level)
+        layout.addWidget(self.level_box)
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setUndoRedoEnabled(False)
+        self.text.setMaximumBlockCount(self.sink.records.maxlen)
+        self.text.setPlaceholderText(placeholder)
+        layout.addWidget(self.text)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(LOG_FLUSH_MS)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def write(self, text):
+        self.sink.info(text)
+
+    def error(self, text):
+        self.sink.error(text)
+
+    def set_level(self, name):
+        # Rebuilds the widget from the ring buffer with the new filter
+        self.level = LEVELS[name]
+        self.text.clear()
+        self.shown = 0
+        self.flush(report_dropped=False)
+
+    def flush(self, report_dropped=True):
+        records, dropped = self.sink.since(self.shown)
+        if not records:
+            return
+        self.shown = records[-1][0]
+        text = format_records(records, self.level)
+        if dropped and report_dropped:
+            text = f"... {dropped} lines dropped\n{text}".rstrip()
+        if not text:
+            return
+        scrollbar = self.text.verticalScrollBar()
+        follow = scrollbar.value() >= scrollbar.maximum() - 4
+        self.text.appendPlainText(text)
+        if follow:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def close_sink(self):
+        self.timer.stop()
+        self.sink.close()
@@ -2,183 +2,383 @@ import sys
 import os
 import threading
 import json
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import time
+STARTED_AT = time.time()  # Time-to-interactive is measured from here
 
 from PySide6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QLineEdit,
-    QPushButton, QLabel, QTabWidget, QScrollArea, QSplitter
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit,
+    QPushButton, QLabel, QTabWidget, QSplitter
 )
 from PySide6.QtCore import Qt, Signal, QObject, QTimer
 import itertools
-import pyttsx3
 import pyaudio
 import vosk
 from llama_cpp import Llama
+from prompt_cache import CountingRAMCache
+from context_manager import ContextManager, format_message
+from tts_pipeline import SpeechPipeline
+from response_cache import ResponseCache
+from semantic_cache import load_semantic_cache
+from host_client import HostClient, HostError, RequestCancelled
+from router import InferenceRouter
+from config import load_config, ASSISTANT_DEFAULTS
+from autotune import apply_tuning
+from metrics import histogram, TRACER, RATE_BUCKETS
+from metrics_panel import MetricsPanel
+from chat_view import ChatView
+from log_sink import LogSink, LogView
+from audio_pipeline import AudioRingBuffer, AudioCaptureThread, EnergyVAD, WakeWordSpotter, SAMPLE_RATE, CHUNK_FRAMES, CHUNK_BYTES, ASR_SECONDS
 
 WAKE_WORD = "tara"
 END_WORD = "over"
+# Inference settings come from pai_config.json ("assistant" section), PAI_* variables and --flags, see config.py
+config = load_config(ASSISTANT_DEFAULTS, "assistant")
+PROMPT_CACHE_MB = config["prompt_cache_mb"]  # Saved KV states for earlier turns, kept small for RPi4 2GB RAM
+USE_MMAP = config["mmap"]  # Map the GGUF instead of reading it, pages load on demand and stay shared
+USE_MLOCK = config["mlock"]  # Pin the weights in RAM; needs a raised memlock limit and enough free memory
+MAX_TOKENS = config["max_tokens"]
+TEMPERATURE = config["temperature"]
+SUMMARIZE_HISTORY = config["summarize"]  # Fold dropped turns into a summary; costs an extra generation on overflow
+MAX_HISTORY_ENTRIES = 200
+RESPONSE_CACHE_PATH = "response_cache.sqlite3"  # Warm replies survive restarts
+RESPONSE_CACHE_CONTEXT_TURNS = 1  # Previous exchanges that are part of the cache key
+SEMANTIC_CACHE_MODEL = ""  # Optional GGUF embedding model, e.g. a small MiniLM/bge; empty disables
+SEMANTIC_CACHE_THRESHOLD = 0.92  # Cosine similarity needed to reuse a reply
+RING_CHUNKS = 40  # 10 s of audio buffered between capture and recognition
+REMOTE_HOSTS = []  # Optional server.py hosts, e.g. ["http://192.168.1.15:5005"]; empty runs everything locally
+SHORT_QUERY_TOKENS = 12  # Commands this short always run on the local model
+COMMAND_TIMEOUT = 8.0  # Seconds of silence after the wake word before going back to wake word spotting
+CHAT_RETENTION = config["chat_retention"]  # Chat messages kept in the window, older ones are paged to disk
+LOG_FILE = config["log_file"]  # Optional rotating copy of the Log tab, empty keeps the log in memory only
+
+PROMPT_BUILD_SECONDS = histogram("pai_prompt_build_seconds", "Time to fit the history into the prompt budget")
+FIRST_TOKEN_SECONDS = histogram("pai_first_token_seconds", "Generation start to first token, by route")
+PROMPT_EVAL_RATE = histogram("pai_prompt_eval_tokens_per_second", "Local prompt tokens evaluated per second", RATE_BUCKETS)
+GENERATION_RATE = histogram("pai_generation_tokens_per_second", "Reply tokens per second after the first, by route", RATE_BUCKETS)
 
 class WorkerSignals(QObject):
-    log = Signal(str)
     response = Signal(str)
     partial_response = Signal(str)
-    error = Signal(str)
     typing = Signal(bool)
+    status = Signal(str)
 
 class VoiceAssistantWorker(threading.Thread):
-    def __init__(self, signals, model_path, vosk_model_path):
+    def __init__(self, signals, model_path, vosk_model_path, log_sink=None, audio_source=None, llm_factory=Llama,
+                 speech_engine=None, trace=None):
+        # audio_source, llm_factory and speech_engine replace the microphone, Llama and
+        # pyttsx3 (see benchmark.py); trace is called with the name of each pipeline stage
         super().__init__(daemon=True)
         self.signals = signals
+        # Log lines go straight into the thread-safe sink the Log tab drains on its timer
+        log_sink = log_sink or LogSink()
+        self.log = log_sink.info
+        self.log_error = log_sink.error
         self.model_path = model_path
         self.vosk_model_path = vosk_model_path
+        self.audio_source = audio_source
+        self.llm_factory = llm_factory
+        self.trace = trace or (lambda stage: None)
         self.running = True
         self.conversation_history = []
-        self.cache = {}  # Cache for input -> response
-        self.engine = pyttsx3.init()
-        self.load_model()
-        self.load_vosk_model()
-        self.pa = pyaudio.PyAudio()
+        self.route = "local"
+        self.cache = ResponseCache(RESPONSE_CACHE_PATH, context_turns=RESPONSE_CACHE_CONTEXT_TURNS)
+        self.semantic_cache = None  # Built by load_model; disabled until then
+        # Speaks sentences while the reply is generated
+        self.tts = SpeechPipeline(log=self.log, engine_factory=speech_engine,
+                                  on_first_audio=lambda: self.trace("first_audio"))
+        self.host = HostClient(REMOTE_HOSTS, log=self.log) if REMOTE_HOSTS else None
+        self.router = InferenceRouter(self.host, SHORT_QUERY_TOKENS, log=self.log)
+        # The models load on the worker thread so the window comes up immediately
+        self.llm = None
+        self.context = None
+        self.prompt_cache = None
+        self.model_ready = threading.Event()
+        self.vosk_model = None
+        self.pa = pyaudio.PyAudio() if audio_source is None else None
         self.stream = None
         self.rec = None
+        self.ring = AudioRingBuffer(CHUNK_BYTES, RING_CHUNKS)
+        self.vad = None
+        self.capture = None
+        self.commands = ThreadPoolExecutor(max_workers=1, thread_name_prefix="command")  # Handles commands in order, off the audio path
 
     def load_model(self):
-        self.signals.log.emit(f"Loading model from {self.model_path} ...")
-        self.llm = Llama(model_path=self.model_path, n_ctx=1024, n_threads=2)  # Optimized for RPi4 2GB RAM
-        self.signals.log.emit("Model loaded.")
+        try:
+            self.signals.status.emit("Loading model...")
+            self.log(f"Loading model from {self.model_path} ...")
+            # Tuning runs here, off the GUI thread, and only benchmarks on the first start
+            apply_tuning(config, log=self.log)
+            n_ctx = config["n_ctx"]
+            budget = min(config["context_budget"] or n_ctx, n_ctx - MAX_TOKENS)  # Prompt tokens, must leave room for the reply
+            started = time.time()
+            llm = self.llm_factory(model_path=self.model_path, n_ctx=n_ctx, n_threads=config["n_threads"],
+                                   n_batch=config["n_batch"], use_mmap=USE_MMAP, use_mlock=USE_MLOCK)
+            context = ContextManager(llm, budget, summarize=SUMMARIZE_HISTORY)
+            self.log(f"Model loaded in {time.time() - started:.1f}s, warming up...")
+            self.log(f"Warm-up took {context.warm_up():.1f}s")
+            self.prompt_cache = CountingRAMCache(PROMPT_CACHE_MB * 1024 * 1024)
+            llm.set_cache(self.prompt_cache)
+            self.llm, self.context = llm, context
+            self.signals.status.emit("Ready")
+            self.log(f"Ready to answer {time.time() - STARTED_AT:.1f}s after start")
+        except Exception as e:
+            self.signals.status.emit("Model failed to load")
+            self.log_error(f"Error loading model: {str(e)}")
+        finally:
+            self.model_ready.set()
+        # The embedding model loads after the main model so it never delays the first reply
+        self.semantic_cache = load_semantic_cache(SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD, log=self.log)
 
     def load_vosk_model(self):
         if not os.path.exists(self.vosk_model_path):
-            self.signals.log.emit("Vosk model not found. Please download and place it in models/")
+            self.log("Vosk model not found. Please download and place it in models/")
             raise FileNotFoundError("Vosk model not found")
         self.vosk_model = vosk.Model(self.vosk_model_path)
-        self.signals.log.emit("Vosk model loaded.")
+        self.log("Vosk model loaded.")
 
     def run(self):
         try:
-            self.stream = self.pa.open(
-                rate=16000,
+            # Wake word spotting only needs Vosk, so listening starts while the LLM is still loading
+            threading.Thread(target=self.load_model, daemon=True).start()
+            self.load_vosk_model()
+            self.stream = self.audio_source or self.pa.open(
+                rate=SAMPLE_RATE,
                 channels=1,
                 format=pyaudio.paInt16,
                 input=True,
                 frames_per_buffer=8000
             )
-            self.rec = vosk.KaldiRecognizer(self.vosk_model, 16000)
-            self.signals.log.emit("Listening for wake word 'tara'...")
+            # Capture has its own thread so audio keeps flowing while a command is handled
+            self.capture = AudioCaptureThread(self.stream, self.ring, CHUNK_FRAMES, log=self.log)
+            self.capture.start()
+            if self.host is not None:
+                self.host.start_health_checks()
+            # The full recognizer is only created and fed once the wake word fires
+            wake = WakeWordSpotter(self.vosk_model, WAKE_WORD, SAMPLE_RATE)
+            # Silent chunks never reach either recognizer
+            self.vad = EnergyVAD(SAMPLE_RATE, CHUNK_FRAMES)
+            self.log(f"Listening for wake word 'tara' ({time.time() - STARTED_AT:.1f}s after start)...")
             listening_for_command = False
+            listening_since = 0.0
+            reported_drops = 0
 
             while self.running:
-                try:
-                    data = self.stream.read(4000, exception_on_overflow=False)
-                except Exception as e:
-                    self.signals.log.emit(f"Audio input error: {e}")
+                data = self.ring.read(timeout=0.5)
+                if data is None:
+                    if self.ring.closed:
+                        break
                     continue
+                if self.ring.dropped != reported_drops:
+                    self.log(f"Audio: {self.ring.dropped - reported_drops} chunks dropped, recognition fell behind")
+                    reported_drops = self.ring.dropped
 
-                if self.rec.AcceptWaveform(data):
-                    result = json.loads(self.rec.Result())
-                    text = result.get('text', '').strip().lower()
-                    if WAKE_WORD in text:
-                        self.signals.log.emit("Wake word detected!")
-                        listening_for_command = True
-                    elif listening_for_command:
-                        command = text.replace(WAKE_WORD, "").strip()
-                        if command:
-                            self.signals.log.emit(f"Command: {command}")
-                            if command == END_WORD:
-                                self.signals.log.emit("Conversation ended by user.")
-                                listening_for_command = False
-                                self.conversation_history.clear()
-                                continue
-                            self.signals.typing.emit(True)
-                            response = self.process_command(command)
-                            self.signals.typing.emit(False)
-                            self.signals.response.emit(response)
-                            self.speak(response)
-                            listening_for_command = False
-                else:
-                    partial = json.loads(self.rec.PartialResult())
-                    partial_text = partial.get('partial', '').strip().lower()
-                    if WAKE_WORD in partial_text and not listening_for_command:
-                        self.signals.log.emit("Wake word detected in partial!")
+                chunks, utterance_ended = self.vad.process(data)
+
+                if not listening_for_command:
+                    if any(wake.accept(chunk) for chunk in chunks):
+                        self.log("Wake word detected!")
+                        self.trace("wake")
+                        self.tts.cancel()
                         listening_for_command = True
+                        listening_since = time.time()
+                        if self.rec is None:
+                            self.rec = vosk.KaldiRecognizer(self.vosk_model, SAMPLE_RATE)
+                        else:
+                            self.rec.Reset()
+                        # The command may start in the same chunk as the wake word
+                        self.rec.AcceptWaveform(data)
+                    continue
+
+                result = None
+                for chunk in chunks:
+                    with ASR_SECONDS.time():
+                        if self.rec.AcceptWaveform(chunk):
+                            result = json.loads(self.rec.Result())
+                if self.vad.in_speech:
+                    listening_since = time.time()
+                timed_out = time.time() - listening_since > COMMAND_TIMEOUT
+                # End the command on real silence instead of waiting for Vosk's endpointing
+                if result is None and (utterance_ended or timed_out):
+                    result = json.loads(self.rec.FinalResult())
+                if result is None:
+                    continue
+
+                words = result.get('text', '').strip().lower().split()
+                command = " ".join(word for word in words if word != WAKE_WORD)
+                if command:
+                    self.log(f"Command: {command}")
+                    self.trace("command")
+                    listening_for_command = False
+                    if command == END_WORD:
+                        self.log("Conversation ended by user.")
+                        self.commands.submit(self.conversation_history.clear)
+                        continue
+                    self.dispatch(command)
+                elif timed_out:
+                    self.log("No command heard, listening for wake word again.")
+                    listening_for_command = False
         except Exception as e:
-            self.signals.error.emit(str(e))
+            self.log_error(str(e))
+
+    def dispatch(self, command):
+        # Spoken and typed commands share one queue, so only one uses the model, history and TTS at a time
+        self.commands.submit(self.stream_response, command)
+
+    def stream_response(self, command):
+        # Shows and speaks the reply token by token and returns it once generation has ended
+        self.signals.typing.emit(True)
+        self.tts.begin()
+        started = time.time()
+        response = ""
+        for token in self.process_command(command):
+            if not response:
+                self.trace("first_token")
+                self.log(f"First token after {time.time() - started:.2f}s")
+            response += token
+            self.signals.partial_response.emit(response)
+            self.tts.feed(token)
+        self.tts.end()
+        self.trace("reply_done")
+        self.signals.typing.emit(False)
+        return response
 
     def process_command(self, command):
+        # Yields the reply as llama-cpp produces it
         try:
             # Check cache first
-            if command in self.cache:
-                self.signals.log.emit(f"Cache hit for command: {command}")
-                return self.cache[command]
-
-            # Append user message as tuple
+            cached = self.cache.get(command, self.conversation_history)
+            self.log(f"Response cache: {self.cache.summary()}")
+            if cached is None and self.semantic_cache is not None:
+                match = self.semantic_cache.get(command, self.conversation_history)
+                if match is not None:
+                    cached, score = match
+                    self.log(f"Semantic cache match ({score:.2f})")
+            if cached is not None:
+                self.log(f"Cache hit for command: {command}")
+                yield cached
+                return
+
+            if self.llm is None and self.router.available_host() is not None:
+                # Still loading, or the GGUF does not fit: the host answers without waiting.
+                # Token counts are word estimates, there is no local tokenizer yet.
+                self.log("Local model not ready, answering on the host")
+                self.route = "remote"
+                prompt = None
+                new_tokens = prompt_tokens = len(command.split())
+            else:
+                prompt = self.local_prompt(command)
+                # Tokens the local model has to evaluate if its KV cache holds the last reply
+                new_tokens = self.context.count_tokens(format_message("user", command))
+                if self.conversation_history:
+                    new_tokens += self.context.count_tokens(format_message(*self.conversation_history[-1]))
+                prompt_tokens = self.context.prompt_tokens
+                self.route = self.router.choose(self.context.count_tokens(command), prompt_tokens, new_tokens)
+
+            response = ""
+            reply_tokens = 0
+            self.trace("generation_start")
+            started = time.time()
+            first_token_at = started
+            for token in self.generate(prompt, command):
+                if not response:
+                    token = token.lstrip()
+                if not token:
+                    continue
+                if not response:
+                    first_token_at = time.time()
+                response += token
+                reply_tokens += 1
+                yield token
+            response = response.strip()
+            finished = time.time()
+            TRACER.record("generate", started, finished - started, route=self.route, tokens=reply_tokens)
+            FIRST_TOKEN_SECONDS.labels(route=self.route).observe(first_token_at - started)
+            if reply_tokens > 1 and finished > first_token_at:
+                GENERATION_RATE.labels(route=self.route).observe((reply_tokens - 1) / (finished - first_token_at))
+            if prompt is None and self.route == "local":
+                # The host failed and generate() built the prompt locally after all
+                new_tokens = prompt_tokens = self.context.prompt_tokens
+            eval_tokens = new_tokens if self.router.local_warm else prompt_tokens
+            if self.route == "local" and first_token_at > started:
+                PROMPT_EVAL_RATE.observe(eval_tokens / (first_token_at - started))
+            self.router.record(self.route, eval_tokens, reply_tokens, first_token_at - started, time.time() - started)
+            self.cache.put(command, response, self.conversation_history)
+            if self.semantic_cache is not None:
+                self.semantic_cache.put(command, response, self.conversation_history)
+
+            # Append both turns as tuples
             self.conversation_history.append(("user", command))
-            if len(self.conversation_history) > 20:
-                self.conversation_history = self.conversation_history[-20:]
-
-            # Build prompt with proper formatting
-            prompt = ""
-            for role, content in self.conversation_history:
-                if role == "user":
-                    prompt += f"[INST] {content} [/INST]"
-                elif role == "assistant":
-                    prompt += f"{content}</s>"
-
-            output = self.llm(prompt, max_tokens=150, stop=["</s>"], echo=False)
-            response = output['choices'][0]['text'].strip()
-
-            # Append assistant response as tuple
             self.conversation_history.append(("assistant", response))
-
-            self.signals.log.emit(f"Response: {response}")
-            self.cache[command] = response  # Cache the response
-            return response
+            if len(self.conversation_history) > MAX_HISTORY_ENTRIES:
+                del self.conversation_history[:-(MAX_HISTORY_ENTRIES // 2)]
+
+            self.log(f"Response: {response}")
+            if self.prompt_cache is not None:
+                cache_stats = self.prompt_cache.stats()
+                self.log(
+                    f"Prompt cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                    f"{cache_stats['reused_tokens']} tokens reused ({cache_stats['reused_ratio']:.0%} of prompt tokens)"
+                )
         except Exception as e:
-            self.signals.error.emit(f"Error generating response: {str(e)}")
-            return f"Error: {str(e)}"
+            self.log_error(f"Error generating response: {str(e)}")
+            yield f"Error: {str(e)}"
+
+    def local_prompt(self, command):
+        # Waits for the local model and builds the prompt within the token budget,
+        # oldest turns are dropped or summarized
+        if not self.model_ready.is_set():
+            self.log("Waiting for the model to finish loading...")
+            self.model_ready.wait()
+        if self.llm is None:
+            raise RuntimeError("Model failed to load")
+        with PROMPT_BUILD_SECONDS.time(), TRACER.span("prompt.build"):
+            prompt = self.context.build_prompt(self.conversation_history, command)
+        if self.context.dropped:
+            self.log(f"Context: {self.context.dropped} older messages outside the prompt")
+        return prompt
+
+    def generate(self, prompt, command):
+        # Yields raw text chunks from the routed model, falling back to local
+        # generation if the host fails before producing anything. prompt is None
+        # when the command was routed remote before the local model was ready.
+        if self.route == "remote":
+            produced = False
+            try:
+                payload = {"input": command, "history": [list(entry) for entry in self.conversation_history]}
+                for token in self.router.remote_tokens(payload):
+                    produced = True
+                    yield token
+                return
+            except RequestCancelled:
+                raise
+            except HostError as e:
+                if produced:
+                    raise
+                self.log(f"Host failed ({e}), answering locally")
+                self.route = "local"
+                if prompt is None:
+                    prompt = self.local_prompt(command)
+
+        for chunk in self.llm(prompt, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, stop=["</s>"], echo=False, stream=True):
+            yield chunk['choices'][0]['text']
 
     def speak(self, text):
-        self.engine.say(text)
-        self.engine.runAndWait()
+        self.tts.say(text)
 
     def stop(self):
         self.running = False
+        if self.capture:
+            self.capture.stop()
+        self.ring.close()
+        self.commands.shutdown(wait=False)
+        self.tts.stop()
+        self.cache.close()
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
-        self.pa.terminate()
-
-class CommandProcessorThread(threading.Thread):
-    def __init__(self, worker, command, signals):
-        super().__init__(daemon=True)
-        self.worker = worker
-        self.command = command
-        self.signals = signals
-
-    def run(self):
-        import time
-        import threading
-        self.signals.typing.emit(True)
-        full_response = self.worker.process_command(self.command)
-
-        # Run speech synthesis in a separate thread to allow simultaneous speaking and streaming
-        def speak_async(text):
-            self.worker.speak(text)
-
-        speak_thread = threading.Thread(target=speak_async, args=(full_response,), daemon=True)
-        speak_thread.start()
-
-        # Simulate streaming by emitting partial responses word by word
-        words = full_response.split()
-        partial = ""
-        for word in words:
-            if partial:
-                partial += " "
-            partial += word
-            self.signals.partial_response.emit(partial)
-            time.sleep(0.2)  # small delay to simulate streaming word by word
-        self.signals.typing.emit(False)
-        # Remove emitting full response again to avoid duplicate message
-        # self.signals.response.emit(full_response)
+        if self.pa:
+            self.pa.terminate()
 
 class AssistantGUI(QWidget):
     def __init__(self):
@@ -188,6 +388,7 @@ class AssistantGUI(QWidget):
         self.setMinimumSize(600, 400)
 
         self.typing_label = QLabel("")  # Initialize early to avoid NoneType errors
+        self.chat_view = None  # Created in init_ui, apply_theme runs before that
 
         self.dark_theme = True
         self.apply_theme()
@@ -207,29 +408,30 @@ class AssistantGUI(QWidget):
         self.typing_label.setStyleSheet("font-style: italic; color: #00ffff; font-size: 16pt; padding: 5px;")
 
         self.signals = WorkerSignals()
-        self.signals.log.connect(self.append_log)
         self.signals.response.connect(self.append_response)
         self.signals.partial_response.connect(self.append_partial_response)
-        self.signals.error.connect(self.append_log)
         self.signals.typing.connect(self.show_typing)
+        self.signals.status.connect(self.show_status)
 
         self.init_ui()
 
-        model_path = "mistral-7b-instruct-v0.2.Q3_K_L.gguf"  # Lightweight model for RPi4 2GB RAM
-        vosk_model_path = "vosk-model-small-en-us-0.15"
+        model_path = config["model_path"]  # Lightweight model for RPi4 2GB RAM
+        vosk_model_path = config["vosk_model_path"]
 
 
-        self.worker = VoiceAssistantWorker(self.signals, model_path, vosk_model_path)
+        self.worker = VoiceAssistantWorker(self.signals, model_path, vosk_model_path, log_sink=self.log_tab.sink)
         self.worker.start()
 
         # Display previous conversation history in the chat GUI
         self.load_conversation_history()
 
     def apply_theme(self):
+        if self.chat_view is not None:
+            self.chat_view.set_dark(self.dark_theme)
         if self.dark_theme:
             self.setStyleSheet("""
                 QWidget { background: #0f1115; color: #e6eef2; }
-                QLineEdit, QTextEdit { background: #121419; border-radius: 10px; padding: 8px; color: #e6eef2; }
+                QLineEdit, QTextEdit, QPlainTextEdit { background: #121419; border-radius: 10px; padding: 8px; color: #e6eef2; }
                 QPushButton { background: #00d1a1; color: #04201b; border-radius: 10px; padding: 10px; }
                 QPushButton:hover { background: #00b388; }
                 QTabWidget::pane { background: #121419; border-radius: 12px; }
@@ -239,7 +441,7 @@ class AssistantGUI(QWidget):
         else:
             self.setStyleSheet("""
                 QWidget { background: #f7f9fb; color: #222; }
-                QLineEdit, QTextEdit { background: #fff; border-radius: 10px; padding: 8px; color: #222; }
+                QLineEdit, QTextEdit, QPlainTextEdit { background: #fff; border-radius: 10px; padding: 8px; color: #222; }
                 QPushButton { background: #00796b; color: white; border-radius: 10px; padding: 10px; }
                 QPushButton:hover { background: #004d40; }
                 QTabWidget::pane { background: #fff; border-radius: 12px; }
@@ -268,8 +470,11 @@ class AssistantGUI(QWidget):
         title.setStyleSheet("font-weight: 700;")
         subtitle = QLabel("Powered by Local LLM")
         subtitle.setStyleSheet("color: #9aa3ad; font-size: 12px;")
+        self.status_label = QLabel("Starting...")
+        self.status_label.setStyleSheet("color: #9aa3ad; font-size: 12px;")
         title_layout.addWidget(title)
         title_layout.addWidget(subtitle)
+        title_layout.addWidget(self.status_label)
         brand_layout.addLayout(title_layout)
         header_layout.addLayout(brand_layout)
         header_layout.addStretch()
@@ -286,13 +491,9 @@ class AssistantGUI(QWidget):
         # Chat panel
         chat_widget = QWidget()
         chat_layout = QVBoxLayout(chat_widget)
-        self.messages_scroll = QScrollArea()
-        self.messages_scroll.setWidgetResizable(True)
-        self.messages_container = QWidget()
-        self.messages_layout = QVBoxLayout(self.messages_container)
-        self.messages_layout.setAlignment(Qt.AlignTop)
-        self.messages_scroll.setWidget(self.messages_container)
-        chat_layout.addWidget(self.messages_scroll)
+        self.chat_view = ChatView(CHAT_RETENTION)
+        self.chat_view.set_dark(self.dark_theme)
+        chat_layout.addWidget(self.chat_view)
 
         # Typing animation label
         self.typing_label = QLabel("")
@@ -322,8 +523,7 @@ class AssistantGUI(QWidget):
         side_widget = QWidget()
         side_layout = QVBoxLayout(side_widget)
         self.side_tabs = QTabWidget()
-        self.log_tab = QTextEdit()
-        self.log_tab.setReadOnly(True)
+        self.log_tab = LogView(LogSink(file_path=LOG_FILE))
         self.settings_tab = QWidget()
         settings_layout = QVBoxLayout(self.settings_tab)
         self.theme_label = QLabel("Theme:")
@@ -336,6 +536,7 @@ class AssistantGUI(QWidget):
         settings_layout.addWidget(self.theme_dark_btn)
         self.side_tabs.addTab(self.log_tab, "Log")
         self.side_tabs.addTab(self.settings_tab, "Settings")
+        self.side_tabs.addTab(MetricsPanel(), "Metrics")
         side_layout.addWidget(self.side_tabs)
         main_splitter.addWidget(side_widget)
         main_splitter.setStretchFactor(1, 1)
@@ -349,39 +550,17 @@ class AssistantGUI(QWidget):
         self.apply_theme()
 
     def append_message(self, text, msg_type):
-        msg = QLabel(text)
-        msg.setWordWrap(True)
-        font = msg.font()
-        font.setPointSize(14)  # Increase font size
-        msg.setFont(font)
-        if msg_type == 'user':
-            msg.setStyleSheet("background: linear-gradient(90deg,#0b6ff7,#1a9bff); color: white; padding: 10px; border-radius: 10px; margin: 5px; font-size: 14pt;")
-        else:
-            if self.dark_theme:
-                # Different color for dark mode bot messages, text color white
-                msg.setStyleSheet("background: linear-gradient(90deg,#ff9f43,#ff6f00); color: white; padding: 10px; border-radius: 10px; margin: 5px; font-size: 14pt;")
-            else:
-                # Light mode bot messages, text color black
-                msg.setStyleSheet("background: linear-gradient(90deg,#0fffd0,#70f2c3); color: black; padding: 10px; border-radius: 10px; margin: 5px; font-size: 14pt;")
-        self.messages_layout.addWidget(msg)
-        QTimer.singleShot(0, lambda: self.messages_scroll.verticalScrollBar().setValue(self.messages_scroll.verticalScrollBar().maximum()))
+        self.chat_view.append_message(text, msg_type)
 
-    def append_log(self, text):
-        timestamp = datetime.now().strftime("[%H:%M:%S]")
-        self.log_tab.append(f"{timestamp} {text}")
+    def append_error(self, text):
+        self.log_tab.error(text)
 
     def append_response(self, text):
         self.append_message(text, 'bot')
 
     def append_partial_response(self, text):
-        # Append or update the last bot message with partial text and blinking cursor
-        if self.messages_layout.count() == 0:
-            self.append_message(text + " |", 'bot')
-        else:
-            last_msg = self.messages_layout.itemAt(self.messages_layout.count() - 1).widget()
-            if last_msg:
-                last_msg.setText(text + " |")
-        QTimer.singleShot(0, lambda: self.messages_scroll.verticalScrollBar().setValue(self.messages_scroll.verticalScrollBar().maximum()))
+        # The first token creates the bot bubble, later ones are repainted at most once per frame
+        self.chat_view.update_partial(text)
 
     def load_conversation_history(self):
         # Display previous conversation history in the chat GUI
@@ -390,25 +569,24 @@ class AssistantGUI(QWidget):
             if msg.strip() and not msg.startswith("[INST]") and not msg.endswith("[/INST]"):
                 self.append_message(msg, 'bot')
 
+    def show_status(self, text):
+        self.status_label.setText(text)
+
     def show_typing(self, is_typing):
         try:
             if self.typing_label is not None:
                 if is_typing:
+                    self.chat_view.finish_partial()
                     self.typing_animation_timer.start()
                     self.bot_loading_label.setText("Loading...")
                 else:
                     self.typing_animation_timer.stop()
                     self.typing_label.setText("")
                     self.bot_loading_label.setText("")
-                    # Remove blinking cursor from last bot message
-                    if self.messages_layout.count() > 0:
-                        last_msg = self.messages_layout.itemAt(self.messages_layout.count() - 1).widget()
-                        if last_msg:
-                            text = last_msg.text()
-                            if text.endswith(" |"):
-                                last_msg.setText(text[:-2])
+                    # Show the last tokens and remove the cursor from the streamed bot message
+                    self.chat_view.finish_partial()
         except Exception as e:
-            self.append_log(f"Error in show_typing: {str(e)}")
+            self.append_error(f"Error in show_typing: {str(e)}")
 
     def send_message(self):
         text = self.message_input.text().strip()
@@ -416,8 +594,7 @@ class AssistantGUI(QWidget):
             self.append_message(text, 'user')
             self.message_input.clear()
             # Run command processing in a separate thread
-            thread = CommandProcessorThread(self.worker, text, self.signals)
-            thread.start()
+            self.worker.dispatch(text)
 
     def update_typing_animation(self):
         next_text = next(self.typing_animation_iterator)
@@ -425,6 +602,8 @@ class AssistantGUI(QWidget):
 
     def closeEvent(self, event):
         self.worker.stop()
+        self.chat_view.close_archive()
+        self.log_tab.close_sink()
         event.accept()
 
 if __name__ == "__main__":
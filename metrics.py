@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import atexit
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_PATH = os.environ.get("PAI_TRACE", "")  # Set to a file name to record spans and dump them at exit
+TRACE_MAX_EVENTS = 100000
+
+# Seconds; spans everything from a VAD frame to a full reply
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATE_BUCKETS = (0.5, 1, 2, 3, 5, 8, 12, 20, 35, 50, 100, 200, 500)  # tokens per second
+
+# ---------------- METRICS ----------------
+# Process-wide counters, gauges and histograms. Every module registers its
+# metrics at import, the server renders them in the Prometheus text format on
+# /metrics and the GUIs show snapshots in their Metrics tab.
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.lock = threading.Lock()
+        self.children = {}  # label key -> value or histogram state
+
+    def labels(self, **labels):
+        return LabeledMetric(self, label_key(labels))
+
+class LabeledMetric:
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def __getattr__(self, name):
+        method = getattr(self.metric, name)
+        return lambda *args, **kwargs: method(*args, key=self.key, **kwargs)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, key=()):
+        with self.lock:
+            self.children[key] = self.children.get(key, 0) + amount
+
+    def value(self, key=()):
+        return self.children.get(key, 0)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name + "_total", key, value) for key, value in self.children.items()]
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function=None):
+        super().__init__(name, help_text)
+        self.function = function  # Read at render time, for values another object already tracks
+
+    def set(self, value, key=()):
+        with self.lock:
+            self.children[key] = value
+
+    def value(self, key=()):
+        if self.function is not None:
+            return self.function()
+        return self.children.get(key, 0)
+
+    def samples(self):
+        if self.function is not None:
+            return [(self.name, (), self.function())]
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.children.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, key=()):
+        with self.lock:
+            state = self.children.get(key)
+            if state is None:
+                state = self.children[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            index = 0
+            while index < len(self.buckets) and value > self.buckets[index]:
+                index += 1
+            state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, key=()):
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - started, key=key)
+
+    def quantile(self, q, key=()):
+        # Interpolates inside the bucket holding the q-th observation, like Prometheus' histogram_quantile
+        with self.lock:
+            state = self.children.get(key)
+            if not state or not state["count"]:
+                return None
+            counts = list(state["counts"])
+            total = state["count"]
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self, key=()):
+        with self.lock:
+            state = self.children.get(key)
+            count = state["count"] if state else 0
+            mean = state["sum"] / count if count else None
+        return {"count": count, "mean": mean, "p50": self.quantile(0.5, key), "p95": self.quantile(0.95, key)}
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, state in self.children.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    samples.append((self.name + "_bucket", key + (("le", le),), cumulative))
+                samples.append((self.name + "_sum", key, state["sum"]))
+                samples.append((self.name + "_count", key, state["count"]))
+        return samples
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        # Registering a name twice returns the first metric, so modules can be imported by several entry points
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        # (name, labels, summary) rows for the GUI metrics panel
+        rows = []
+        for metric in list(self.metrics.values()):
+            for key in list(metric.children) or [()]:
+                labels = format_labels(key)
+                if isinstance(metric, Histogram):
+                    rows.append((metric.name + labels, metric.summary(key)))
+                else:
+                    rows.append((metric.name + labels, {"value": metric.value(key)}))
+        return rows
+
+REGISTRY = Registry()
+
+def counter(name, help_text):
+    return REGISTRY.register(Counter(name, help_text))
+
+def gauge(name, help_text, function=None):
+    return REGISTRY.register(Gauge(name, help_text, function))
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, help_text, buckets))
+
+# Shared by the response, semantic and prompt caches
+CACHE_LOOKUPS = counter("pai_cache_lookups", "Cache lookups by cache and result")
+
+# ---------------- TRACING ----------------
+class Tracer:
+    # Opt-in span recorder. Spans are kept in a bounded buffer and written in
+    # the Chrome trace event format, which chrome://tracing and Perfetto open.
+    def __init__(self, path=""):
+        self.path = path
+        self.enabled = bool(path)
+        self.events = deque(maxlen=TRACE_MAX_EVENTS)
+        self.pid = os.getpid()
+        if self.enabled:
+            atexit.register(self.dump)
+
+    @contextmanager
+    def span(self, name, **args):
+        if not self.enabled:
+            yield
+            return
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, started, time.time() - started, **args)
+
+    def record(self, name, started, seconds, **args):
+        if self.enabled:
+            self.events.append({
+                "name": name, "ph": "X", "ts": int(started * 1e6), "dur": int(seconds * 1e6),
+                "pid": self.pid, "tid": threading.get_ident(), "args": args,
+            })
+
+    def dump(self, path=None):
+        with open(path or self.path, "w") as f:
+            json.dump({"traceEvents": list(self.events)}, f)
+
+TRACER = Tracer(TRACE_PATH)
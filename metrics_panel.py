@@ -0,0 +1,51 @@
+from PySide6.QtWidgets import QTableWidget, QTableWidgetItem, QHeaderView
+from PySide6.QtCore import QTimer
+
+from metrics import REGISTRY
+
+REFRESH_MS = 1000
+COLUMNS = ["Metric", "Count / value", "Mean", "p50", "p95"]
+
+# ---------------- METRICS PANEL ----------------
+class MetricsPanel(QTableWidget):
+    # Live table of REGISTRY.snapshot(), one row per metric and label set.
+    # Refreshes only while the tab is visible.
+    def __init__(self, parent=None):
+        super().__init__(0, len(COLUMNS), parent)
+        self.setHorizontalHeaderLabels(COLUMNS)
+        self.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.verticalHeader().setVisible(False)
+        self.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(REFRESH_MS)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        rows = REGISTRY.snapshot()
+        self.setRowCount(len(rows))
+        for row, (name, summary) in enumerate(rows):
+            if "value" in summary:
+                cells = [name, format_number(summary["value"]), "", "", ""]
+            else:
+                cells = [name, str(summary["count"])] + [format_number(summary[k]) for k in ("mean", "p50", "p95")]
+            for column, text in enumerate(cells):
+                item = self.item(row, column)
+                if item is None:
+                    self.setItem(row, column, QTableWidgetItem(text))
+                elif item.text() != text:
+                    item.setText(text)
+
+def format_number(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}" if abs(value) < 1000 else f"{value:.0f}"
+    return str(value)
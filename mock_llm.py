@@ -0,0 +1,75 @@
+import time
+import zlib
+
+REPLIES = [
+    "Sure. Here is a short answer to that. Let me know if you want more detail.",
+    "That depends on a few things. The main one is timing, the other is cost. Both matter.",
+    "Good question. The simple version is yes, but there are exceptions worth knowing about.",
+    "I can help with that. First check the settings, then try again. It usually works.",
+]
+
+# ---------------- MOCK LLM ----------------
+class MockLlama:
+    # Deterministic stand-in for llama_cpp.Llama with tunable latency, for
+    # benchmarking everything around the model without a GGUF file. Text is
+    # tokenized per word. The prompt costs prompt_token_seconds per token that
+    # is not a prefix of the previous prompt, like a KV cache would, and every
+    # generated token costs token_seconds. The reply is picked from REPLIES by a
+    # hash of the prompt, so the same prompt always gets the same reply.
+    def __init__(self, model_path=None, n_ctx=1024, prompt_token_seconds=0.002, token_seconds=0.02, **kwargs):
+        self.model_path = model_path
+        self._n_ctx = n_ctx
+        self.prompt_token_seconds = prompt_token_seconds
+        self.token_seconds = token_seconds
+        self.input_ids = []
+        self.cache = None
+
+    def n_ctx(self):
+        return self._n_ctx
+
+    def tokenize(self, text, add_bos=True, special=False):
+        if isinstance(text, bytes):
+            text = text.decode("utf-8", errors="ignore")
+        tokens = [zlib.crc32(word.encode("utf-8")) % 32000 for word in text.split()]
+        return [1] + tokens if add_bos else tokens
+
+    def token_eos(self):
+        return 2
+
+    def set_cache(self, cache):
+        self.cache = cache
+
+    def reset(self):
+        self.input_ids = []
+
+    def eval(self, tokens):
+        # Only the part after the longest common prefix with what is already evaluated costs time
+        reused = 0
+        for old, new in zip(self.input_ids, tokens):
+            if old != new:
+                break
+            reused += 1
+        time.sleep((len(tokens) - reused) * self.prompt_token_seconds)
+        self.input_ids = list(tokens)
+
+    def __call__(self, prompt, max_tokens=16, stream=False, **kwargs):
+        self.eval(self.tokenize(prompt))
+        words = REPLIES[zlib.crc32(prompt.encode("utf-8")) % len(REPLIES)].split()[:max_tokens]
+        chunks = self.generate_chunks(words)
+        if stream:
+            return chunks
+        return {"choices": [{"text": "".join(chunk["choices"][0]["text"] for chunk in chunks)}]}
+
+    def generate_chunks(self, words):
+        for index, word in enumerate(words):
+            time.sleep(self.token_seconds)
+            yield {"choices": [{"text": (" " if index else "") + word}]}
+
+    def close(self):
+        pass
+
+def mock_factory(prompt_token_seconds=0.002, token_seconds=0.02):
+    # Returns a Llama-compatible constructor with the given latencies
+    def create(**kwargs):
+        return MockLlama(prompt_token_seconds=prompt_token_seconds, token_seconds=token_seconds, **kwargs)
+    return create
@@ -0,0 +1,64 @@
+import threading
+from llama_cpp import Llama, LlamaRAMCache
+
+from metrics import CACHE_LOOKUPS
+
+# Every prompt starts with BOS and the same "[INST]" tokens, so a restore only
+# counts as a hit once it reuses more than this, i.e. some actual conversation
+MIN_REUSED_TOKENS = 16
+
+# ---------------- PROMPT CACHE ----------------
+class CountingRAMCache(LlamaRAMCache):
+    # Llama looks up the longest cached token prefix of every prompt, restores that
+    # state and only evaluates the rest. Entries are evicted LRU once the saved
+    # states exceed capacity_bytes. The lock lets several slots share one cache.
+    def __init__(self, capacity_bytes, min_reused_tokens=MIN_REUSED_TOKENS):
+        super().__init__(capacity_bytes=capacity_bytes)
+        self.lock = threading.RLock()
+        self.min_reused_tokens = min_reused_tokens
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+        self.prompt_tokens = 0
+
+    def __getitem__(self, key):
+        with self.lock:
+            self.prompt_tokens += len(key)
+            try:
+                state = super().__getitem__(key)
+            except KeyError:
+                self.record(0)
+                raise
+            self.record(Llama.longest_token_prefix(state.input_ids.tolist(), key))
+            return state
+
+    def record(self, reused):
+        self.reused_tokens += reused
+        if reused > self.min_reused_tokens:
+            self.hits += 1
+            CACHE_LOOKUPS.labels(cache="prompt", result="hit").inc()
+        else:
+            self.misses += 1
+            CACHE_LOOKUPS.labels(cache="prompt", result="miss").inc()
+
+    def __contains__(self, key):
+        with self.lock:
+            return super().__contains__(key)
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            super().__setitem__(key, value)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "reused_tokens": self.reused_tokens,
+                "reused_ratio": round(self.reused_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+                "entries": len(self.cache_state),
+                "size_bytes": self.cache_size,
+                "capacity_bytes": self.capacity_bytes,
+            }
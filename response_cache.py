@@ -0,0 +1,186 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import CACHE_LOOKUPS
+
+FILLER_WORDS = {"um", "uh", "er", "ah", "hmm", "please", "okay", "ok"}
+CONTRACTIONS = {
+    "whats": "what is",
+    "whos": "who is",
+    "wheres": "where is",
+    "hows": "how is",
+    "whens": "when is",
+    "thats": "that is",
+    "dont": "do not",
+    "cant": "can not",
+}
+# Replies to these depend on when they are asked or on the state of the
+# machine, so commands containing any of them are never cached
+VOLATILE_WORDS = {
+    "time", "date", "day", "today", "tonight", "tomorrow", "yesterday", "now", "currently",
+    "weather", "forecast", "temperature", "rain", "news", "latest",
+    "status", "battery", "cpu", "memory", "disk", "uptime", "running",
+}
+DEFAULT_TTL = 24 * 3600  # Anything else may still go stale, so entries do not outlive a day
+# Stripped from word edges only, so "2+2", "2-2" and "3.5" keep their operators and decimal points
+EDGE_PUNCTUATION = ",.?!;:\"“”‘()[]{}…"
+
+def normalize_command(command):
+    # "Um, what's the weather?" and "what is the weather" share one key
+    text = command.lower().replace("'", "").replace("’", "")
+    words = []
+    for word in text.split():
+        word = word.strip(EDGE_PUNCTUATION)
+        if not word or word in FILLER_WORDS:
+            continue
+        words.extend(CONTRACTIONS.get(word, word).split())
+    return " ".join(words)
+
+def is_volatile(text):
+    # text is a normalized command
+    return not VOLATILE_WORDS.isdisjoint(text.split())
+
+def context_digest(history, turns):
+    # Short hash of the last `turns` exchanges, empty for a fresh conversation
+    if not turns or not history:
+        return ""
+    context = [list(entry) for entry in history[-2 * turns:]]
+    return hashlib.sha1(json.dumps(context).encode("utf-8")).hexdigest()[:16]
+
+# ---------------- RESPONSE CACHE ----------------
+class ResponseCache:
+    # LRU cache of replies keyed on the normalized command and, with
+    # context_turns > 0, on the last exchanges of the conversation. Entries
+    # expire after ttl seconds and the cache stays under max_entries and
+    # max_bytes. Volatile commands ("what time is it") bypass the cache. With a path, entries are written through to sqlite so warm
+    # entries survive restarts.
+    def __init__(self, path=None, max_entries=500, max_bytes=2 * 1024 * 1024, ttl=DEFAULT_TTL, context_turns=1):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.context_turns = context_turns
+        self.entries = OrderedDict()  # key -> (reply, created_at)
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypassed = 0
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, reply TEXT, created_at REAL)"
+            )
+            self.load()
+
+    def load(self):
+        rows = self.db.execute(
+            "SELECT key, reply, created_at FROM responses WHERE created_at > ? ORDER BY created_at",
+            (time.time() - self.ttl,)
+        ).fetchall()
+        with self.lock:
+            for key, reply, created_at in rows:
+                self.store(key, reply, created_at)
+            self.evict()
+            self.db.execute("DELETE FROM responses WHERE created_at <= ?", (time.time() - self.ttl,))
+            self.db.commit()
+
+    def make_key(self, command, history=()):
+        key = normalize_command(command)
+        context = context_digest(history, self.context_turns)
+        if context:
+            key += "|" + context
+        return key
+
+    def get(self, command, history=()):
+        if is_volatile(normalize_command(command)):
+            with self.lock:
+                self.bypassed += 1
+            CACHE_LOOKUPS.labels(cache="response", result="bypass").inc()
+            return None
+        key = self.make_key(command, history)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                self.remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CACHE_LOOKUPS.labels(cache="response", result="miss").inc()
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            CACHE_LOOKUPS.labels(cache="response", result="hit").inc()
+            return entry[0]
+
+    def put(self, command, reply, history=()):
+        key = self.make_key(command, history)
+        if not key or is_volatile(normalize_command(command)):
+            return
+        created_at = time.time()
+        with self.lock:
+            self.store(key, reply, created_at)
+            self.evict()
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, reply, created_at) VALUES (?, ?, ?)",
+                    (key, reply, created_at)
+                )
+                self.db.commit()
+
+    def store(self, key, reply, created_at):
+        if key in self.entries:
+            self.remove(key, persist=False)
+        self.entries[key] = (reply, created_at)
+        self.size_bytes += len(key.encode("utf-8")) + len(reply.encode("utf-8"))
+
+    def remove(self, key, persist=True):
+        reply, _ = self.entries.pop(key)
+        self.size_bytes -= len(key.encode("utf-8")) + len(reply.encode("utf-8"))
+        if persist and self.db is not None:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes):
+            self.remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size_bytes = 0
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bypassed": self.bypassed,
+                "entries": len(self.entries),
+                "size_bytes": self.size_bytes,
+            }
+
+    def summary(self):
+        stats = self.stats()
+        return (
+            f"{stats['hits']}/{stats['hits'] + stats['misses']} hits ({stats['hit_rate']:.0%}), "
+            f"{stats['entries']} entries, {stats['size_bytes'] // 1024} KB"
+        )
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.commit()
+                self.db.close()
+                self.db = None
@@ -0,0 +1,82 @@
+import queue
+import threading
+import time
+
+DEFAULT_FIRST_TOKEN_SECONDS = 1.0  # Remote time to first token assumed until a host has answered
+
+# ---------------- INFERENCE ROUTER ----------------
+class InferenceRouter:
+    # Chooses per command between the local Llama and a server.py host by
+    # estimating the time to a full reply on each side:
+    #   local  = prompt tokens still to evaluate / local prompt speed + reply tokens / local speed
+    #   remote = host time to first token + reply tokens / remote speed
+    # Speeds are measured from real replies. Short commands stay local, and
+    # everything stays local while no host is reachable.
+    def __init__(self, host_client=None, short_query_tokens=12, remote_margin=0.8, log=None):
+        self.host_client = host_client
+        self.short_query_tokens = short_query_tokens
+        self.remote_margin = remote_margin  # Remote has to be clearly faster to be worth the network
+        self.log = log or (lambda text: None)
+        self.local_prompt_tps = 20.0
+        self.local_gen_tps = 2.0
+        self.remote_gen_tps = 8.0
+        self.reply_tokens = 60.0  # Expected reply length
+        self.local_warm = False  # Local KV cache already holds the conversation up to the last reply
+
+    def available_host(self):
+        if self.host_client is None:
+            return None
+        now = time.time()
+        hosts = [host for host in self.host_client.hosts if host.available(now)]
+        if not hosts:
+            return None
+        return min(hosts, key=self.first_token_seconds)
+
+    def first_token_seconds(self, host):
+        # Measured on real replies only; a /health round trip says nothing about prompt evaluation
+        return host.first_token if host.first_token is not None else DEFAULT_FIRST_TOKEN_SECONDS
+
+    def choose(self, command_tokens, prompt_tokens, new_tokens):
+        host = self.available_host()
+        if host is None or command_tokens <= self.short_query_tokens:
+            return "local"
+        eval_tokens = new_tokens if self.local_warm else prompt_tokens
+        local = eval_tokens / self.local_prompt_tps + self.reply_tokens / self.local_gen_tps
+        remote = self.first_token_seconds(host) + self.reply_tokens / self.remote_gen_tps
+        route = "remote" if remote < local * self.remote_margin else "local"
+        self.log(f"Route: {route} (local ~{local:.1f}s, remote ~{remote:.1f}s)")
+        return route
+
+    def record(self, route, eval_tokens, reply_tokens, first_token_seconds, total_seconds):
+        self.reply_tokens = 0.8 * self.reply_tokens + 0.2 * reply_tokens
+        generation_seconds = total_seconds - first_token_seconds
+        if route == "local":
+            if eval_tokens and first_token_seconds > 0:
+                self.local_prompt_tps = 0.7 * self.local_prompt_tps + 0.3 * (eval_tokens / first_token_seconds)
+            if reply_tokens > 1 and generation_seconds > 0:
+                self.local_gen_tps = 0.7 * self.local_gen_tps + 0.3 * ((reply_tokens - 1) / generation_seconds)
+            self.local_warm = True
+        else:
+            if reply_tokens > 1 and generation_seconds > 0:
+                self.remote_gen_tps = 0.7 * self.remote_gen_tps + 0.3 * ((reply_tokens - 1) / generation_seconds)
+            self.local_warm = False
+
+    def remote_tokens(self, payload, history=None):
+        # Turns HostClient's callback stream into a generator
+        tokens = queue.Queue()
+
+        def run():
+            try:
+                self.host_client.stream_generate(payload, tokens.put, history=history)
+                tokens.put(None)
+            except Exception as e:
+                tokens.put(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            item = tokens.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
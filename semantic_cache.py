@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from response_cache import normalize_command, context_digest, is_volatile
+from metrics import CACHE_LOOKUPS
+
+# ---------------- SEMANTIC CACHE ----------------
+class SemanticCache:
+    # Matches near-duplicate commands ("whats the weather" / "what is the weather
+    # like") by cosine similarity of their embeddings. Unit vectors live in one
+    # preallocated float32 matrix, so a lookup is a single matrix-vector product.
+    # Only entries recorded under the same conversation context can match.
+    def __init__(self, embed, threshold=0.92, max_entries=512, context_turns=1):
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.context_turns = context_turns
+        self.vectors = None  # Allocated once the embedding size is known
+        self.contexts = np.zeros(max_entries, dtype=np.int64)
+        self.last_used = np.zeros(max_entries, dtype=np.float64)
+        self.replies = [None] * max_entries
+        self.count = 0
+        self.hits = 0
+        self.misses = 0
+        self.last_query = None  # (text, vector) so put() can skip re-embedding
+        self.lock = threading.Lock()
+
+    def vector_for(self, text):
+        if self.last_query is not None and self.last_query[0] == text:
+            return self.last_query[1]
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        if vector.ndim == 2:
+            vector = vector.mean(axis=0)  # Per-token output from models without pooling
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        self.last_query = (text, vector)
+        return vector
+
+    def context_id(self, history):
+        digest = context_digest(history, self.context_turns)
+        return int(digest[:15], 16) if digest else 0
+
+    def get(self, command, history=()):
+        # Returns (reply, similarity) or None
+        text = normalize_command(command)
+        if not text or is_volatile(text):
+            return None
+        with self.lock:
+            vector = self.vector_for(text)
+            if self.count:
+                scores = self.vectors[:self.count] @ vector
+                scores[self.contexts[:self.count] != self.context_id(history)] = -1.0
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.last_used[best] = time.time()
+                    self.hits += 1
+                    CACHE_LOOKUPS.labels(cache="semantic", result="hit").inc()
+                    return self.replies[best], float(scores[best])
+            self.misses += 1
+            CACHE_LOOKUPS.labels(cache="semantic", result="miss").inc()
+            return None
+
+    def put(self, command, reply, history=()):
+        text = normalize_command(command)
+        if not text or is_volatile(text):
+            return
+        with self.lock:
+            vector = self.vector_for(text)
+            if self.vectors is None:
+                self.vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if self.count < self.max_entries:
+                row = self.count
+                self.count += 1
+            else:
+                row = int(np.argmin(self.last_used))  # Least recently used
+            self.vectors[row] = vector
+            self.contexts[row] = self.context_id(history)
+            self.last_used[row] = time.time()
+            self.replies[row] = reply
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": self.count,
+            }
+
+def load_semantic_cache(model_path, threshold=0.92, n_threads=2, log=None):
+    # Returns None when no embedding model is configured or it cannot be loaded
+    if not model_path or not os.path.exists(model_path):
+        return None
+    try:
+        from llama_cpp import Llama
+        embedder = Llama(model_path=model_path, embedding=True, n_ctx=256, n_threads=n_threads, verbose=False)
+    except Exception as e:
+        if log:
+            log(f"Semantic cache disabled: {e}")
+        return None
+    if log:
+        log(f"Semantic cache enabled with {os.path.basename(model_path)}")
+    return SemanticCache(embedder.embed, threshold=threshold)
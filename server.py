@@ -1,40 +1,621 @@
-import os
-from flask import Flask, request, jsonify
+import json
+import math
+import queue
+import signal
+import threading
+import time
+STARTED_AT = time.time()  # time-to-interactive is measured from here
+from collections import OrderedDict
+from flask import Flask, request, jsonify, Response, stream_with_context
+from flask_socketio import SocketIO, emit
 from llama_cpp import Llama
+from prompt_cache import CountingRAMCache
+from context_manager import ContextManager
+from speculative import make_draft
+from config import load_config, SERVER_DEFAULTS
+from autotune import apply_tuning
+from mock_llm import mock_factory
+from metrics import REGISTRY, counter, gauge, histogram, TRACER, RATE_BUCKETS
+
+
+# Settings come from pai_config.json, PAI_* variables and --flags, see config.py
+config = apply_tuning(load_config(SERVER_DEFAULTS, "server"))
+MODEL_PATH = config["model_path"]
+N_CTX = config["n_ctx"]
+N_THREADS = config["n_threads"]
+N_BATCH = config["n_batch"]
+MAX_TOKENS = config["max_tokens"]  # default reply length, requests may ask for less or up to the reserved room
+TEMPERATURE = config["temperature"]
+CONTEXT_BUDGET = min(config["context_budget"] or N_CTX, N_CTX - MAX_TOKENS)  # prompt tokens, must leave room for the reply
+SUMMARIZE_HISTORY = config["summarize"]
+USE_MMAP = config["mmap"]
+USE_MLOCK = config["mlock"]
+NUM_SLOTS = config["slots"]
+MAX_QUEUE_DEPTH = config["max_queue"]
+PROMPT_CACHE_MB = config["prompt_cache_mb"]  # saved KV states shared by all slots
+SESSION_TTL = config["session_ttl"]
+MAX_SESSIONS = config["max_sessions"]
+DRAFT_MODEL = config["draft"]
+DRAFT_TOKENS = config["draft_tokens"]
+REQUEST_TIMEOUT = config["request_timeout"]
+SHUTDOWN_GRACE = config["shutdown_grace"]
+# MockLlama stands in for the model, so Flask, JSON and prompt building can be profiled alone
+LLM_FACTORY = mock_factory(config["mock_prompt_token_ms"] / 1000, config["mock_token_ms"] / 1000) if config["mock_llm"] else Llama
+MAX_REPLY_TOKENS = N_CTX - CONTEXT_BUDGET  # room left in the context after the longest prompt
+MAX_SESSION_ENTRIES = 200  # history entries kept per session, the prompt itself is bounded by CONTEXT_BUDGET
+
+# Exposed on /metrics in the Prometheus text format
+REQUESTS = counter("pai_server_requests", "Requests by transport and admission status")
+JOBS = counter("pai_server_jobs", "Finished generation jobs by outcome")
+DRAFT_TOKENS_COUNTED = counter("pai_server_draft_tokens", "Speculative draft tokens by result")
+QUEUE_SECONDS = histogram("pai_server_queue_seconds", "Time a job waited for its slot")
+PROMPT_BUILD_SECONDS = histogram("pai_server_prompt_build_seconds", "Time to fit the history into the prompt budget")
+FIRST_TOKEN_SECONDS = histogram("pai_server_first_token_seconds", "Generation start to first token")
+GENERATION_RATE = histogram("pai_server_generation_tokens_per_second", "Reply tokens per second after the first", RATE_BUCKETS)
+JOB_SECONDS = histogram("pai_server_job_seconds", "Slot time per job, generation included")
 
 app = Flask(__name__)
+# The Socket.IO transport runs on whichever server serves the app
+socketio = SocketIO(app, async_mode="eventlet" if config["serve"] == "eventlet" else "threading",
+                    cors_allowed_origins="*")
+
+# ---------------- SCHEDULER ----------------
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Server busy, try again later")
+        self.retry_after = retry_after
+
+class NotReady(Exception):
+    def __init__(self, retry_after, message="Model is still loading"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RequestTimeout(Exception):
+    pass
+
+class InvalidRequest(Exception):
+    pass
+
+class UnknownSession(Exception):
+    # The session expired, was evicted or the server restarted; the client has to resend its history
+    def __init__(self, session_id):
+        super().__init__(f"Unknown session {session_id}, resend the history")
+        self.session_id = session_id
+
+class GenerationJob:
+    # How request handlers block on the token queue. The evented server swaps
+    # this for eventlet's thread pool so waiting never stalls its hub.
+    blocking_call = staticmethod(lambda fn: fn())
+
+    def __init__(self, history, user_input, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, slot=None):
+        self.history = history
+        self.user_input = user_input
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.slot = slot
+        self.tokens = queue.Queue()
+        self.cancelled = threading.Event()
+        self.enqueued_at = time.time()
+        self.deadline = self.enqueued_at + REQUEST_TIMEOUT  # queueing counts against the timeout too
+        self.metrics = {}  # filled in by the slot before the end marker
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def __iter__(self):
+        # Yields text chunks as the slot produces them; None marks the end
+        while True:
+            item = self.blocking_call(self.tokens.get)
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+class Slot(threading.Thread):
+    def __init__(self, index, scheduler, n_threads, prompt_cache):
+        super().__init__(daemon=True)
+        self.index = index
+        self.scheduler = scheduler
+        self.jobs = queue.Queue()
+        self.load = 0  # queued + running jobs, guarded by scheduler.lock
+        self.n_threads = n_threads
+        self.prompt_cache = prompt_cache
+        self.ready = threading.Event()
+        self.error = None
+        self.draft = None
+        self.llm = None
+        self.context = None
+
+    def load_model(self):
+        # Runs on the slot thread so the server answers /health while weights load
+        started = time.time()
+        # Drafted tokens are verified in one batch by the main model, so the
+        # output is exactly what normal decoding would have produced
+        draft = make_draft(DRAFT_MODEL, DRAFT_TOKENS, N_CTX)
+        # Weights are mmapped, so every slot shares one copy of the model pages
+        llm = LLM_FACTORY(model_path=MODEL_PATH, n_ctx=N_CTX, n_threads=self.n_threads, n_batch=N_BATCH,
+                          draft_model=draft, use_mmap=USE_MMAP, use_mlock=USE_MLOCK)
+        context = ContextManager(llm, CONTEXT_BUDGET, summarize=SUMMARIZE_HISTORY)
+        warm_up = context.warm_up()
+        llm.set_cache(self.prompt_cache)
+        # The scheduler only hands jobs to slots whose llm is set
+        self.draft, self.context, self.llm = draft, context, llm
+        print(f"Slot {self.index}: loaded in {time.time() - started:.1f}s (warm-up {warm_up:.1f}s)")
+
+    def run(self):
+        try:
+            self.load_model()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Slot {self.index}: failed to load model: {e}")
+            return
+        finally:
+            self.ready.set()
+            self.scheduler.slot_ready()
+        while True:
+            job = self.jobs.get()
+            self.scheduler.job_started(job)
+            started = time.time()
+            try:
+                if time.time() > job.deadline:
+                    raise RequestTimeout(f"Request timed out after {REQUEST_TIMEOUT}s in the queue")
+                QUEUE_SECONDS.observe(started - job.enqueued_at)
+                if not job.cancelled.is_set():
+                    # Prompts are built here because counting and summarizing need this slot's Llama
+                    with PROMPT_BUILD_SECONDS.time(), TRACER.span("server.prompt_build", slot=self.index):
+                        prompt = self.context.build_prompt(job.history, job.user_input)
+                    if self.draft is not None:
+                        self.draft.reset()
+                        proposed, accepted = self.draft.counts()
+                    tokens = 0
+                    generation_started = time.time()
+                    for chunk in self.llm(prompt, max_tokens=job.max_tokens, temperature=job.temperature,
+                                          stop=["</s>"], echo=False, stream=True):
+                        if job.cancelled.is_set():
+                            break
+                        if time.time() > job.deadline:
+                            # Leaving the loop stops llama-cpp from generating further tokens
+                            raise RequestTimeout(f"Request timed out after {REQUEST_TIMEOUT}s")
+                        if not tokens:
+                            first_token_at = time.time()
+                        tokens += 1
+                        job.tokens.put(chunk['choices'][0]['text'])
+                    job.metrics = self.metrics(tokens, generation_started, first_token_at if tokens else None)
+                    job.metrics["queue_seconds"] = round(started - job.enqueued_at, 3)
+                    TRACER.record("server.generate", generation_started, time.time() - generation_started,
+                                  slot=self.index, tokens=tokens)
+                    if "first_token_seconds" in job.metrics:
+                        FIRST_TOKEN_SECONDS.observe(job.metrics["first_token_seconds"])
+                    if "tokens_per_second" in job.metrics:
+                        GENERATION_RATE.observe(job.metrics["tokens_per_second"])
+                    if self.draft is not None:
+                        proposed_total, accepted_total = self.draft.counts()
+                        proposed, accepted = proposed_total - proposed, accepted_total - accepted
+                        job.metrics["draft_proposed"] = proposed
+                        job.metrics["draft_accepted"] = accepted
+                        job.metrics["draft_acceptance"] = round(accepted / proposed, 3) if proposed else 0.0
+                        DRAFT_TOKENS_COUNTED.labels(result="proposed").inc(proposed)
+                        DRAFT_TOKENS_COUNTED.labels(result="accepted").inc(accepted)
+                JOBS.labels(outcome="cancelled" if job.cancelled.is_set() else "ok").inc()
+                job.tokens.put(None)
+            except Exception as e:
+                JOBS.labels(outcome="timeout" if isinstance(e, RequestTimeout) else "error").inc()
+                job.tokens.put(e)
+            finally:
+                JOB_SECONDS.observe(time.time() - started)
+                self.scheduler.job_finished(self, job, time.time() - started)
+
+    @staticmethod
+    def metrics(tokens, started, first_token_at):
+        now = time.time()
+        metrics = {"tokens": tokens, "seconds": round(now - started, 3)}
+        if first_token_at is not None:
+            metrics["first_token_seconds"] = round(first_token_at - started, 3)
+            # Rate after the first token, so prompt evaluation does not skew it
+            if tokens > 1 and now > first_token_at:
+                metrics["tokens_per_second"] = round((tokens - 1) / (now - first_token_at), 2)
+        return metrics
+
+class Scheduler:
+    def __init__(self, num_slots, max_queue_depth):
+        self.max_queue_depth = max_queue_depth
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.avg_job_seconds = 5.0
+        self.ready_at = None
+        self.accepting = True
+        self.jobs = set()  # submitted jobs that have not finished, so shutdown can cancel them
+        self.prompt_cache = CountingRAMCache(PROMPT_CACHE_MB * 1024 * 1024)
+        n_threads = max(1, N_THREADS // num_slots)
+        self.slots = [Slot(i, self, n_threads, self.prompt_cache) for i in range(num_slots)]
+        for slot in self.slots:
+            slot.start()
+
+    def slot_ready(self):
+        with self.lock:
+            if not self.ready() or self.ready_at is not None:
+                return
+            self.ready_at = time.time()
+        print(f"Ready to serve {self.ready_at - STARTED_AT:.1f}s after start")
+
+    def ready(self):
+        return all(slot.ready.is_set() for slot in self.slots)
+
+    def status(self):
+        if not self.ready():
+            return "loading"
+        return "ok" if any(slot.llm is not None for slot in self.slots) else "error"
+
+    def retry_after(self):
+        return max(1, math.ceil((self.waiting + 1) * self.avg_job_seconds / len(self.slots)))
+
+    def submit(self, history, user_input, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, preferred_slot=None):
+        slots = [slot for slot in self.slots if slot.llm is not None]
+        if not slots:
+            raise NotReady(5)
+        with self.lock:
+            if not self.accepting:
+                raise NotReady(SHUTDOWN_GRACE, "Server is shutting down")
+            if self.waiting >= self.max_queue_depth:
+                raise QueueFull(self.retry_after())
+            slot = min(slots, key=lambda s: s.load)
+            # Stay on the slot whose context already holds this conversation unless it is backed up
+            if preferred_slot is not None and preferred_slot < len(self.slots):
+                if self.slots[preferred_slot].llm is not None and self.slots[preferred_slot].load <= slot.load + 1:
+                    slot = self.slots[preferred_slot]
+            slot.load += 1
+            self.waiting += 1
+            job = GenerationJob(history, user_input, max_tokens, temperature, slot.index)
+            self.jobs.add(job)
+        slot.jobs.put(job)
+        return job
+
+    def job_started(self, job):
+        with self.lock:
+            self.waiting -= 1
+
+    def job_finished(self, slot, job, seconds):
+        with self.lock:
+            self.jobs.discard(job)
+            slot.load -= 1
+            self.avg_job_seconds = 0.8 * self.avg_job_seconds + 0.2 * seconds
+
+    def drain(self, grace, sleep=time.sleep):
+        # Stops taking requests, lets running ones finish for up to grace
+        # seconds and cancels whatever is still queued or generating after that
+        with self.lock:
+            self.accepting = False
+        deadline = time.time() + grace
+        while self.jobs and time.time() < deadline:
+            sleep(0.2)
+        with self.lock:
+            leftover = list(self.jobs)
+        for job in leftover:
+            job.cancel()
+        return len(leftover)
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                "waiting": self.waiting,
+                "slot_load": [slot.load for slot in self.slots],
+                "avg_job_seconds": round(self.avg_job_seconds, 3),
+                "status": self.status(),
+                "ready_seconds": round(self.ready_at - STARTED_AT, 3) if self.ready_at else None,
+                "prompt_cache": self.prompt_cache.stats(),
+            }
+        if DRAFT_MODEL:
+            drafts = [slot.draft for slot in self.slots if slot.draft is not None]
+            proposed = sum(draft.counts()[0] for draft in drafts)
+            accepted = sum(draft.counts()[1] for draft in drafts)
+            stats["draft"] = {
+                "model": DRAFT_MODEL,
+                "proposed": proposed,
+                "accepted": accepted,
+                "acceptance": round(accepted / proposed, 3) if proposed else 0.0,
+            }
+        return stats
+
+# ---------------- SESSIONS ----------------
+class Session:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.history = []
+        self.slot = None
+        self.last_used = time.time()
+
+class SessionStore:
+    # Sessions are kept in least-recently-used order, so both TTL expiry and
+    # the size cap only ever evict from the front
+    def __init__(self, ttl, max_sessions, max_entries):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_entries = max_entries
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, session_id, create=False):
+        # Returns None for an unknown or expired session unless create is set
+        with self.lock:
+            now = time.time()
+            while self.sessions:
+                oldest = next(iter(self.sessions.values()))
+                if now - oldest.last_used < self.ttl:
+                    break
+                self.sessions.popitem(last=False)
+            session = self.sessions.pop(session_id, None)
+            if session is None:
+                if not create:
+                    return None
+                session = Session(session_id)
+            session.last_used = now
+            self.sessions[session_id] = session
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+            return session
+
+    def append_turn(self, session, user_input, reply):
+        with self.lock:
+            session.history.append(("user", user_input))
+            session.history.append(("assistant", reply))
+            # Trim in blocks so the replayed history keeps the same cut points between trims
+            if len(session.history) > self.max_entries:
+                del session.history[:-(self.max_entries // 2)]
+
+    def delete(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self.sessions)
+
+sessions = SessionStore(SESSION_TTL, MAX_SESSIONS, MAX_SESSION_ENTRIES)
 
-# Load model once at startup
-MODEL_PATH = "mistral-7b-instruct-v0.2.Q3_K_L.gguf"
-print(f"Loading model from {MODEL_PATH}...")
-llm = Llama(model_path=MODEL_PATH, n_ctx=1024, n_threads=4)
-print("Model loaded successfully.")
+# Slots load the model in the background; /health reports "loading" until they are done
+print(f"Loading {'MockLlama' if config['mock_llm'] else 'model from ' + MODEL_PATH} into {NUM_SLOTS} slot(s)...")
+if DRAFT_MODEL:
+    print(f"Speculative decoding with draft '{DRAFT_MODEL}', {DRAFT_TOKENS} tokens per draft")
+scheduler = Scheduler(NUM_SLOTS, MAX_QUEUE_DEPTH)
+gauge("pai_server_queue_depth", "Jobs waiting for a slot", lambda: scheduler.waiting)
+gauge("pai_server_sessions", "Sessions held in memory", lambda: len(sessions))
+gauge("pai_server_ready_slots", "Slots with a loaded model", lambda: sum(slot.llm is not None for slot in scheduler.slots))
+
+def sse(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+def reply_events(job, on_done, session_id):
+    # One event per token, then a final event with the full reply
+    response = ""
+    try:
+        for token in job:
+            if not response:
+                token = token.lstrip()
+            if not token:
+                continue
+            response += token
+            yield {"token": token}
+        if job.cancelled.is_set():
+            # Cancelled replies are not finished and do not become part of the session
+            return
+        response = response.strip()
+        on_done(response)
+        yield {"done": True, "response": response, "session_id": session_id, "metrics": job.metrics}
+    except Exception as e:
+        yield {"error": str(e)}
+    finally:
+        # Stops the slot early when the client disconnects mid-stream
+        job.cancel()
+
+def stream_tokens(job, on_done, session_id):
+    # Server-sent events, see reply_events
+    for event in reply_events(job, on_done, session_id):
+        yield sse(event)
+
+def parse_history(history):
+    # Client-sent history has to be a list of [role, text] pairs; anything else
+    # would only fail later in a slot, or stay in the session it seeded
+    if not isinstance(history, list):
+        raise InvalidRequest("history must be a list of [role, text] pairs")
+    turns = []
+    for entry in history:
+        if (not isinstance(entry, (list, tuple)) or len(entry) != 2
+                or entry[0] not in ("user", "assistant") or not isinstance(entry[1], str)):
+            raise InvalidRequest('history entries must be ["user" or "assistant", text] pairs')
+        turns.append((entry[0], entry[1]))
+    return turns
+
+def start_job(data):
+    # Shared by POST /generate and the Socket.IO "generate" event.
+    # Returns the job, the callback that records a finished reply and the session id.
+    user_input = data.get("input", "")
+    history = parse_history(data.get("history", []))
+    session_id = data.get("session_id")
+    if not isinstance(user_input, str):
+        raise InvalidRequest("input must be a string")
+
+    # Per-request overrides; the reply has to fit in the room the prompt budget leaves
+    try:
+        max_tokens = int(data.get("max_tokens", MAX_TOKENS))
+        temperature = float(data.get("temperature", TEMPERATURE))
+    except (TypeError, ValueError):
+        raise InvalidRequest("max_tokens and temperature must be numbers")
+    if not 1 <= max_tokens <= MAX_REPLY_TOKENS:
+        raise InvalidRequest(f"max_tokens must be between 1 and {MAX_REPLY_TOKENS}")
+    if not 0.0 <= temperature <= 2.0:
+        raise InvalidRequest("temperature must be between 0 and 2")
+
+    # Session clients send only the new utterance. A request for a session
+    # the server does not hold must carry "history" (possibly empty) to seed
+    # it, otherwise it is refused so the client can resend what was lost.
+    # Requests without a session_id are stateless and use "history" as-is.
+    session = None
+    if session_id:
+        session = sessions.get(session_id, create="history" in data)
+        if session is None:
+            raise UnknownSession(session_id)
+        if not session.history and history:
+            session.history = history[-MAX_SESSION_ENTRIES:]
+        history = list(session.history)
+
+    job = scheduler.submit(history, user_input, max_tokens, temperature,
+                           preferred_slot=session.slot if session else None)
+
+    def on_done(response):
+        if session is not None:
+            session.slot = job.slot
+            sessions.append_turn(session, user_input, response)
+
+    return job, on_done, session.id if session else None
 
 @app.route("/generate", methods=["POST"])
 def generate():
     try:
         data = request.json
-        user_input = data.get("input", "")
-        history = data.get("history", [])
-
-        # Build prompt from history
-        prompt = ""
-        for role, content in history:
-            if role == "user":
-                prompt += f"[INST] {content} [/INST]"
-            elif role == "assistant":
-                prompt += f"{content}</s>"
+        job, on_done, session_id = start_job(data)
+        REQUESTS.labels(transport="http", status="accepted").inc()
+        if data.get("stream"):
+            return Response(
+                stream_with_context(stream_tokens(job, on_done, session_id)),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
 
-        # Add current input
-        prompt += f"[INST] {user_input} [/INST]"
+        try:
+            response = "".join(job).strip()
+        except RequestTimeout as e:
+            return jsonify({"error": str(e)}), 504
+        on_done(response)
 
-        output = llm(prompt, max_tokens=150, stop=["</s>"], echo=False)
-        response = output['choices'][0]['text'].strip()
-
-        return jsonify({"response": response})
+        return jsonify({"response": response, "session_id": session_id, "metrics": job.metrics})
+    except InvalidRequest as e:
+        REQUESTS.labels(transport="http", status="400").inc()
+        return jsonify({"error": str(e)}), 400
+    except UnknownSession as e:
+        REQUESTS.labels(transport="http", status="409").inc()
+        return jsonify({"error": str(e), "session_id": e.session_id}), 409
+    except QueueFull as e:
+        REQUESTS.labels(transport="http", status="429").inc()
+        return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+    except NotReady as e:
+        REQUESTS.labels(transport="http", status="503").inc()
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
     except Exception as e:
+        REQUESTS.labels(transport="http", status="500").inc()
         return jsonify({"error": str(e)}), 500
 
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5005, threaded=True)
+# ---------------- SOCKET.IO ----------------
+# A persistent connection per client. The client emits "generate" with the same
+# fields as POST /generate plus a request_id, and gets "typing", "token", "done"
+# or "error" events tagged with that id. "cancel" stops a request and is
+# acknowledged with "cancelled".
+socket_jobs = {}  # sid -> {request_id: job}
+socket_jobs_lock = threading.Lock()
 
+def push_reply(sid, request_id, job, on_done, session_id):
+    socketio.emit("typing", {"request_id": request_id, "typing": True}, to=sid)
+    try:
+        for event in reply_events(job, on_done, session_id):
+            name = "token" if "token" in event else "done" if event.get("done") else "error"
+            socketio.emit(name, dict(event, request_id=request_id), to=sid)
+    finally:
+        with socket_jobs_lock:
+            socket_jobs.get(sid, {}).pop(request_id, None)
+        socketio.emit("typing", {"request_id": request_id, "typing": False}, to=sid)
+
+@socketio.on("generate")
+def socket_generate(data):
+    request_id = data.get("request_id")
+    try:
+        job, on_done, session_id = start_job(data)
+    except InvalidRequest as e:
+        REQUESTS.labels(transport="socketio", status="400").inc()
+        emit("error", {"request_id": request_id, "error": str(e), "status": 400})
+        return
+    except UnknownSession as e:
+        REQUESTS.labels(transport="socketio", status="409").inc()
+        emit("error", {"request_id": request_id, "error": str(e), "status": 409})
+        return
+    except QueueFull as e:
+        REQUESTS.labels(transport="socketio", status="429").inc()
+        emit("error", {"request_id": request_id, "error": str(e), "status": 429, "retry_after": e.retry_after})
+        return
+    except NotReady as e:
+        REQUESTS.labels(transport="socketio", status="503").inc()
+        emit("error", {"request_id": request_id, "error": str(e), "status": 503, "retry_after": e.retry_after})
+        return
+    REQUESTS.labels(transport="socketio", status="accepted").inc()
+    with socket_jobs_lock:
+        socket_jobs.setdefault(request.sid, {})[request_id] = job
+    socketio.start_background_task(push_reply, request.sid, request_id, job, on_done, session_id)
+
+@socketio.on("cancel")
+def socket_cancel(data):
+    request_id = data.get("request_id")
+    with socket_jobs_lock:
+        job = socket_jobs.get(request.sid, {}).get(request_id)
+    if job is not None:
+        job.cancel()
+    emit("cancelled", {"request_id": request_id, "found": job is not None})
+
+@socketio.on("disconnect")
+def socket_disconnect():
+    with socket_jobs_lock:
+        jobs = socket_jobs.pop(request.sid, {})
+    for job in jobs.values():
+        job.cancel()
+
+@app.route("/sessions/<session_id>", methods=["DELETE"])
+def delete_session(session_id):
+    return jsonify({"deleted": sessions.delete(session_id)})
+
+@app.route("/health", methods=["GET"])
+def health():
+    # Load balancers and HostClient only route to a host once this returns 200
+    status = scheduler.status()
+    body = {"status": status, "waiting": scheduler.waiting, "slots": len(scheduler.slots),
+            "ready_slots": sum(slot.llm is not None for slot in scheduler.slots)}
+    return jsonify(body), 200 if status == "ok" else 503
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(dict(scheduler.stats(), sessions=len(sessions)))
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+def serve_evented():
+    # eventlet serves requests on green threads while inference stays on the
+    # slots' OS threads, which all map the same model file. Nothing is monkey
+    # patched: the only blocking call in a handler, waiting for tokens, goes
+    # through eventlet's thread pool.
+    import eventlet
+    import eventlet.wsgi
+    from eventlet import tpool
+
+    tpool.set_num_threads(MAX_QUEUE_DEPTH + NUM_SLOTS + 4)  # one waiting handler per queued or running job
+    GenerationJob.blocking_call = staticmethod(tpool.execute)
+
+    stopping = []
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: stopping.append(signum))
+
+    listener = eventlet.listen((config["host"], config["port"]))
+    server = eventlet.spawn(eventlet.wsgi.server, listener, app, log_output=False)
+    print(f"Serving on {config['host']}:{config['port']} with {NUM_SLOTS} worker slot(s)")
+    while not stopping:
+        eventlet.sleep(0.5)
+
+    print(f"Shutting down, giving in-flight requests up to {SHUTDOWN_GRACE}s...")
+    cancelled = scheduler.drain(SHUTDOWN_GRACE, sleep=eventlet.sleep)
+    if cancelled:
+        print(f"Cancelled {cancelled} unfinished request(s)")
+    server.kill()
+    listener.close()
+
+if __name__ == "__main__":
+    if config["serve"] == "eventlet":
+        serve_evented()
+    else:
+        socketio.run(app, host=config["host"], port=config["port"], allow_unsafe_werkzeug=True)
@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+import uuid
+
+import socketio
+import websocket  # websocket-client; without it python-socketio silently falls back to long-polling
+
+from host_client import HostClient, HostError, RequestCancelled, RetryableError, SessionLost, HOST_FIRST_TOKEN
+
+# ---------------- SOCKET CONNECTION ----------------
+class SocketConnection:
+    # One persistent Socket.IO connection to a host. Events carry the request_id
+    # they belong to and are routed to that request's queue. Only the WebSocket
+    # transport is allowed: long-polling costs an HTTP request per token.
+    def __init__(self, base_url, connect_timeout=5):
+        self.base_url = base_url
+        self.queues = {}
+        self.lock = threading.Lock()
+        self.sio = socketio.Client(reconnection=False)
+        for name in ("typing", "token", "done", "error", "cancelled"):
+            self.sio.on(name, self.router(name))
+        self.sio.on("disconnect", self.on_disconnect)
+        self.sio.connect(base_url, transports=["websocket"], wait_timeout=connect_timeout)
+
+    @property
+    def connected(self):
+        return self.sio.connected
+
+    def router(self, name):
+        def handle(data):
+            with self.lock:
+                events = self.queues.get(data.get("request_id"))
+            if events is not None:
+                events.put((name, data))
+        return handle
+
+    def on_disconnect(self, *args):
+        with self.lock:
+            waiting = list(self.queues.values())
+        for events in waiting:
+            events.put(("disconnect", {}))
+
+    def open(self, request_id):
+        events = queue.Queue()
+        with self.lock:
+            self.queues[request_id] = events
+        return events
+
+    def close_request(self, request_id):
+        with self.lock:
+            self.queues.pop(request_id, None)
+
+    def close(self):
+        self.sio.disconnect()
+
+# ---------------- SOCKET HOST CLIENT ----------------
+class SocketHostClient(HostClient):
+    # Streams replies over one Socket.IO connection per host instead of a POST
+    # per turn. Host selection, retries, failover and health checks are
+    # HostClient's; only a single attempt (stream_once) and cancel() differ.
+    # Health checks and session deletion still use plain HTTP.
+    def __init__(self, base_urls, **kwargs):
+        super().__init__(base_urls, **kwargs)
+        self.connections = {}  # base_url -> SocketConnection
+
+    def connection(self, host):
+        connection = self.connections.get(host.base_url)
+        if connection is None or not connection.connected:
+            try:
+                connection = SocketConnection(host.base_url)
+            except (socketio.exceptions.ConnectionError, OSError) as e:
+                raise RetryableError(f"Connection failed: {e}", host_failed=True)
+            self.connections[host.base_url] = connection
+            self.log(f"{host.base_url}: socket connected")
+        return connection
+
+    def stream_once(self, host, request, on_token):
+        started = time.time()
+        request_id = uuid.uuid4().hex
+        with self.lock:
+            host.outstanding += 1
+        connection = None
+        try:
+            connection = self.connection(host)
+            events = connection.open(request_id)
+            with self.lock:
+                if self.cancelled:
+                    raise RequestCancelled("Request cancelled")
+                self.current = (connection, request_id)
+            connection.sio.emit("generate", dict(request, request_id=request_id))
+
+            first_token = True
+            while True:
+                try:
+                    name, data = events.get(timeout=self.timeout)
+                except queue.Empty:
+                    if first_token:
+                        raise RetryableError("Host did not answer in time", host_failed=True)
+                    raise HostError("Error: Host stopped streaming")
+                if name == "typing":
+                    if data.get("typing") and first_token:
+                        self.log(f"{host.base_url} responded. Connection OK")
+                elif name == "token":
+                    if first_token:
+                        HOST_FIRST_TOKEN.observe(time.time() - started)
+                        host.record_first_token(time.time() - started)
+                        self.log(f"First token after {time.time() - started:.2f}s")
+                        first_token = False
+                    on_token(data["token"])
+                elif name == "done":
+                    self.log(f"Reply complete after {time.time() - started:.2f}s")
+                    return data
+                elif name == "cancelled":
+                    raise RequestCancelled("Request cancelled")
+                elif name == "error":
+                    status = data.get("status")
+                    if status == 429:
+                        raise RetryableError("Host busy", data.get("retry_after"))
+                    if status == 503:
+                        raise RetryableError(data["error"], data.get("retry_after"), host_failed=True)
+                    if status == 409:
+                        raise SessionLost(data["error"])
+                    raise HostError(f"Error: {data['error']}")
+                elif name == "disconnect":
+                    if self.cancelled:
+                        raise RequestCancelled("Request cancelled")
+                    if first_token:
+                        raise RetryableError("Connection lost", host_failed=True)
+                    raise HostError("Connection lost")
+        finally:
+            if connection is not None:
+                connection.close_request(request_id)
+            with self.lock:
+                host.outstanding -= 1
+                self.current = None
+
+    def cancel(self):
+        # The host stops generating and acknowledges with "cancelled", which ends stream_once
+        with self.lock:
+            self.cancelled = True
+            current = self.current
+        if current is not None:
+            connection, request_id = current
+            try:
+                connection.sio.emit("cancel", {"request_id": request_id})
+            except socketio.exceptions.SocketIOError:
+                connection.close()
@@ -0,0 +1,66 @@
+import threading
+import numpy as np
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+# ---------------- SPECULATIVE DECODING ----------------
+class SmallModelDraft(LlamaDraftModel):
+    # Proposes the next tokens greedily with a small model. It must share the
+    # main model's vocabulary, otherwise nothing it drafts will be accepted.
+    # generate() keeps the draft context's matching prefix, so only the tokens
+    # added since the last call are evaluated.
+    def __init__(self, model_path, num_pred_tokens=4, n_ctx=1024, n_threads=1):
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids, /, **kwargs):
+        draft = []
+        for token in self.llm.generate(input_ids.tolist(), top_k=1, temp=0.0, reset=True):
+            if token == self.llm.token_eos():
+                break
+            draft.append(token)
+            if len(draft) >= self.num_pred_tokens:
+                break
+        return np.array(draft, dtype=np.intc)
+
+class CountingDraft(LlamaDraftModel):
+    # Wraps a draft model and measures how many of its tokens the main model
+    # accepts. Llama calls the draft again after verifying the previous draft,
+    # and the tokens it kept are then the prefix of input_ids past the old end.
+    def __init__(self, draft):
+        self.draft = draft
+        self.lock = threading.Lock()
+        self.proposed = 0
+        self.accepted = 0
+        self.pending = None  # (input length, drafted tokens) awaiting verification
+
+    def __call__(self, input_ids, /, **kwargs):
+        with self.lock:
+            if self.pending is not None:
+                start, drafted = self.pending
+                self.proposed += len(drafted)
+                for kept, proposed in zip(input_ids[start:], drafted):
+                    if kept != proposed:
+                        break
+                    self.accepted += 1
+        draft = self.draft(input_ids, **kwargs)
+        with self.lock:
+            self.pending = (len(input_ids), draft) if len(draft) else None
+        return draft
+
+    def reset(self):
+        # Drops a draft that was never verified because generation stopped
+        with self.lock:
+            self.pending = None
+
+    def counts(self):
+        with self.lock:
+            return self.proposed, self.accepted
+
+def make_draft(mode, num_pred_tokens, n_ctx, n_threads=1):
+    # mode is "" (off), "lookup" (n-grams from the prompt) or the path of a small GGUF model
+    if not mode:
+        return None
+    if mode == "lookup":
+        return CountingDraft(LlamaPromptLookupDecoding(max_ngram_size=2, num_pred_tokens=num_pred_tokens))
+    return CountingDraft(SmallModelDraft(mode, num_pred_tokens, n_ctx, n_threads))
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The tests import the modules from the repository root, like the entry points do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# server.py loads its slots at import; MockLlama stands in for the GGUF model
+os.environ.setdefault("PAI_MOCK_LLM", "true")
+os.environ.setdefault("PAI_MOCK_TOKEN_MS", "100")
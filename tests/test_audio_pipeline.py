@@ -0,0 +1,69 @@
+import numpy as np
+
+from audio_pipeline import AudioRingBuffer, EnergyVAD, CHUNK_FRAMES
+
+def noise(rng, rms, frames=CHUNK_FRAMES):
+    return np.clip(rng.normal(0, rms, frames), -32768, 32767).astype(np.int16).tobytes()
+
+def speech(rng):
+    # Loud with a short quiet stretch, like a word and the pause after it
+    samples = rng.normal(0, 6000, CHUNK_FRAMES)
+    samples[:800] = rng.normal(0, 50, 800)
+    return np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+
+def test_ring_buffer_is_fifo():
+    ring = AudioRingBuffer(chunk_bytes=4, capacity=3)
+    ring.write(b"aaaa")
+    ring.write(b"bb")
+    assert len(ring) == 2
+    assert ring.read() == b"aaaa"
+    assert ring.read() == b"bb"
+    assert ring.read(timeout=0.01) is None
+
+def test_ring_buffer_overwrites_oldest_when_full():
+    ring = AudioRingBuffer(chunk_bytes=1, capacity=2)
+    for data in (b"a", b"b", b"c"):
+        ring.write(data)
+    assert ring.dropped == 1
+    assert ring.read() == b"b" and ring.read() == b"c"
+
+def test_ring_buffer_close_drains_then_stops():
+    ring = AudioRingBuffer(chunk_bytes=1, capacity=2)
+    ring.write(b"a")
+    ring.close()
+    assert ring.read() == b"a"
+    assert ring.read() is None
+
+def test_vad_ignores_a_quiet_room():
+    rng = np.random.default_rng(0)
+    vad = EnergyVAD()
+    for _ in range(10):
+        chunks, ended = vad.process(noise(rng, 50))
+        assert chunks == [] and not ended
+    assert not vad.in_speech
+
+def test_vad_passes_speech_with_preroll_and_ends_on_silence():
+    rng = np.random.default_rng(1)
+    vad = EnergyVAD(end_silence_ms=500)
+    quiet = noise(rng, 50)
+    vad.process(quiet)
+    chunks, _ = vad.process(speech(rng))
+    assert chunks[0] == quiet  # pre-roll keeps the start of the word
+    assert vad.in_speech
+    ended = [vad.process(noise(rng, 50))[1] for _ in range(3)]
+    assert ended == [False, True, False]
+    assert not vad.in_speech
+
+def test_vad_does_not_stay_in_speech_on_steady_noise():
+    rng = np.random.default_rng(2)
+    vad = EnergyVAD()
+    for _ in range(40):
+        vad.process(noise(rng, 800))
+    assert not vad.in_speech
+    assert vad.noise_floor > 300
+    # Speech still starts and ends over that noise
+    for _ in range(4):
+        vad.process(speech(rng))
+    assert vad.in_speech
+    ended = [vad.process(noise(rng, 800))[1] for _ in range(5)]
+    assert any(ended)
@@ -0,0 +1,55 @@
+from context_manager import ContextManager, format_message
+from mock_llm import MockLlama
+
+def conversation(turns, words=10):
+    history = []
+    for i in range(turns):
+        history.append(("user", f"question {i} " + "word " * words))
+        history.append(("assistant", f"answer {i} " + "word " * words))
+    return history
+
+def test_prompt_fits_budget():
+    llm = MockLlama()
+    context = ContextManager(llm, budget=100)
+    prompt = context.build_prompt(conversation(20), "what now")
+    assert context.prompt_tokens <= 100
+    assert len(llm.tokenize(prompt)) <= 100
+    assert prompt.endswith(format_message("user", "what now"))
+
+def test_short_history_is_kept_whole():
+    context = ContextManager(MockLlama(), budget=1000)
+    history = conversation(3)
+    prompt = context.build_prompt(history, "hi")
+    assert context.dropped == 0
+    assert prompt.startswith(format_message(*history[0]))
+
+def test_window_starts_on_a_user_turn():
+    context = ContextManager(MockLlama(), budget=90)
+    history = conversation(12)
+    context.build_prompt(history, "hi")
+    assert context.dropped > 0
+    assert history[context.dropped][0] == "user"
+
+def test_cut_points_stay_put_between_overflows():
+    # The prompt prefix only moves when the window overflows again, not every turn
+    context = ContextManager(MockLlama(), budget=200)
+    history = conversation(30)
+    starts = []
+    for turns in range(10, 30):
+        context.build_prompt(history[:2 * turns], "hi")
+        starts.append(context.dropped)
+    assert starts == sorted(starts)
+    assert len(set(starts)) < len(starts) // 2
+
+def test_same_history_gives_same_prompt():
+    history = conversation(15)
+    first = ContextManager(MockLlama(), budget=120).build_prompt(history, "hi")
+    second = ContextManager(MockLlama(), budget=120).build_prompt(history, "hi")
+    assert first == second
+
+def test_dropped_turns_are_summarized():
+    context = ContextManager(MockLlama(), budget=150, summarize=True, summary_tokens=20)
+    prompt = context.build_prompt(conversation(20), "hi")
+    assert context.dropped > 0
+    assert prompt.startswith("[INST] Summary of our earlier conversation:")
+    assert len(context.summaries) == 1
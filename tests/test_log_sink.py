@@ -0,0 +1,48 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from log_sink import LogSink, format_records
+
+def test_readers_see_new_lines_and_how_many_were_dropped():
+    sink = LogSink(capacity=3)
+    for i in range(5):
+        sink.info(f"line {i}")
+    records, dropped = sink.since(0)
+    assert [record[3] for record in records] == ["line 2", "line 3", "line 4"]
+    assert dropped == 2
+    assert sink.since(records[-1][0]) == ([], 0)
+
+def test_workers_write_from_any_thread():
+    sink = LogSink(capacity=1000)
+    threads = [threading.Thread(target=lambda: [sink.info("x") for _ in range(100)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    records, dropped = sink.since(0)
+    assert len(records) == 400 and dropped == 0
+
+def test_error_filter():
+    sink = LogSink()
+    sink.info("fine")
+    sink.error("broken")
+    records, _ = sink.since(0)
+    text = format_records(records, level=40)
+    assert "broken" in text and "fine" not in text
+
+def test_file_is_written_in_the_background(tmp_path):
+    path = tmp_path / "pai.log"
+    sink = LogSink(file_path=str(path))
+    sink.info("background line")
+    deadline = time.time() + 5
+    while "background line" not in (path.read_text() if path.exists() else ""):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    sink.info("last line")
+    sink.close()
+    assert "last line" in path.read_text()
+    assert not sink.file_thread.is_alive()
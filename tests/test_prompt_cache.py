@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from llama_cpp import LlamaState
+
+from prompt_cache import CountingRAMCache
+
+def state(tokens):
+    return LlamaState(np.array(tokens, dtype=np.intc), np.zeros(0, dtype=np.single), len(tokens), b"", 100, 0)
+
+def test_template_prefix_alone_is_not_a_hit():
+    cache = CountingRAMCache(10000, min_reused_tokens=4)
+    cache[[1, 2, 3, 10, 11, 12]] = state([1, 2, 3, 10, 11, 12])
+    cache[[1, 2, 3, 20, 21]]  # shares only BOS and the template
+    stats = cache.stats()
+    assert stats["hits"] == 0 and stats["misses"] == 1
+    assert stats["reused_tokens"] == 3
+
+def test_earlier_turn_reused_is_a_hit():
+    cache = CountingRAMCache(10000, min_reused_tokens=4)
+    turn = [1, 2, 3, 10, 11, 12, 13, 14]
+    cache[turn] = state(turn)
+    cache[turn + [30, 31]]
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["hit_rate"] == 1.0
+    assert stats["reused_tokens"] == 8
+    assert stats["reused_ratio"] == 0.8
+
+def test_no_shared_prefix_is_a_miss():
+    cache = CountingRAMCache(10000)
+    cache[[1, 2]] = state([1, 2])
+    with pytest.raises(KeyError):
+        cache[[5, 6]]
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,68 @@
+from response_cache import ResponseCache, normalize_command
+
+def test_normalize_drops_fillers_punctuation_and_contractions():
+    assert normalize_command("Um, what's the weather?") == "what is the weather"
+    assert normalize_command("What is the weather") == "what is the weather"
+
+def test_normalize_keeps_operators_and_decimals():
+    assert normalize_command("what is 2+2") != normalize_command("what is 2-2")
+    assert normalize_command("what is 2*3?") == "what is 2*3"
+    assert normalize_command("add 3.5 and 1.") == "add 3.5 and 1"
+
+def test_hit_and_miss():
+    cache = ResponseCache()
+    assert cache.get("hello") is None
+    cache.put("hello", "hi there")
+    assert cache.get("Hello!") == "hi there"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_time_and_state_dependent_commands_are_not_cached():
+    cache = ResponseCache()
+    for command in ("What time is it?", "what's the weather like tomorrow", "show the battery status"):
+        cache.put(command, "stale answer")
+        assert cache.get(command) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bypassed"] == 3 and cache.stats()["misses"] == 0
+
+def test_entries_expire_within_a_day():
+    assert ResponseCache().ttl <= 24 * 3600
+
+def test_context_is_part_of_the_key():
+    cache = ResponseCache(context_turns=1)
+    history = [("user", "tell me a joke"), ("assistant", "knock knock")]
+    cache.put("why", "because", history)
+    assert cache.get("why", history) == "because"
+    assert cache.get("why") is None
+
+def test_least_recently_used_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put("one", "1")
+    cache.put("two", "2")
+    cache.get("one")
+    cache.put("three", "3")
+    assert cache.get("two") is None
+    assert cache.get("one") == "1" and cache.get("three") == "3"
+    assert cache.stats()["evictions"] == 1
+
+def test_byte_cap_evicts():
+    cache = ResponseCache(max_bytes=100)
+    for i in range(10):
+        cache.put(f"command {i}", "x" * 30)
+    assert cache.stats()["size_bytes"] <= 100
+    assert cache.get("command 9") is not None
+
+def test_expired_entries_miss():
+    cache = ResponseCache(ttl=0)
+    cache.put("hello", "hi")
+    assert cache.get("hello") is None
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path)
+    cache.put("hello", "hi")
+    cache.close()
+    cache = ResponseCache(path)
+    assert cache.get("hello") == "hi"
+    cache.clear()
+    cache.close()
+    assert ResponseCache(path).get("hello") is None
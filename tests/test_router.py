@@ -0,0 +1,28 @@
+from host_client import HostClient
+from router import InferenceRouter
+
+def router_with_host():
+    client = HostClient(["http://127.0.0.1:9"])
+    return InferenceRouter(client, short_query_tokens=2), client, client.hosts[0]
+
+def test_health_checks_do_not_lower_the_first_token_estimate(monkeypatch):
+    router, client, host = router_with_host()
+    host.record_first_token(4.0)
+    monkeypatch.setattr(client, "health", lambda host: {"status": "ok", "latency": 0.05})
+    for _ in range(6):
+        client.check_hosts()
+    assert host.latency < 0.1
+    assert router.first_token_seconds(host) == 4.0
+
+def test_slow_first_token_keeps_commands_local():
+    router, client, host = router_with_host()
+    router.local_warm = True
+    assert router.choose(20, 500, 20) == "remote"  # Default estimate, the host has not answered yet
+    for _ in range(5):
+        host.record_first_token(30.0)
+    assert router.choose(20, 500, 20) == "local"
+
+def test_short_commands_and_missing_hosts_stay_local():
+    router, client, host = router_with_host()
+    assert router.choose(2, 500, 500) == "local"
+    assert InferenceRouter(None).choose(50, 500, 500) == "local"
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+import server
+
+@pytest.fixture(scope="module", autouse=True)
+def ready():
+    deadline = time.time() + 30
+    while not server.scheduler.ready():
+        assert time.time() < deadline, "mock slots did not load"
+        time.sleep(0.05)
+
+def test_session_store_expires_idle_sessions():
+    store = server.SessionStore(ttl=0.05, max_sessions=10, max_entries=10)
+    store.get("a", create=True)
+    assert store.get("a") is not None
+    time.sleep(0.1)
+    assert store.get("a") is None
+
+def test_session_store_evicts_least_recently_used():
+    store = server.SessionStore(ttl=60, max_sessions=2, max_entries=10)
+    store.get("a", create=True)
+    store.get("b", create=True)
+    store.get("a")
+    store.get("c", create=True)
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+
+def test_session_store_trims_history_in_blocks():
+    store = server.SessionStore(ttl=60, max_sessions=2, max_entries=8)
+    session = store.get("a", create=True)
+    for i in range(5):
+        store.append_turn(session, f"q{i}", f"a{i}")
+    assert len(session.history) == 4
+    assert session.history[0] == ("user", "q3")
+
+def test_unknown_session_is_refused_until_history_is_sent():
+    client = server.app.test_client()
+    response = client.post("/generate", json={"input": "hi", "session_id": "lost", "max_tokens": 2})
+    assert response.status_code == 409
+    response = client.post("/generate", json={"input": "hi", "session_id": "lost", "max_tokens": 2,
+                                              "history": [["user", "earlier"], ["assistant", "reply"]]})
+    assert response.status_code == 200
+    assert server.sessions.get("lost").history[:2] == [("user", "earlier"), ("assistant", "reply")]
+
+def test_malformed_history_is_refused_before_seeding():
+    client = server.app.test_client()
+    for history in ([["user", "a", "extra"]], [["system", "a"]], [["user", 5]], "user: a"):
+        response = client.post("/generate", json={"input": "hi", "session_id": "bad", "max_tokens": 2,
+                                                  "history": history})
+        assert response.status_code == 400
+        assert server.sessions.get("bad") is None
+    response = client.post("/generate", json={"input": "hi", "session_id": "bad", "max_tokens": 2,
+                                              "history": [["user", "a"]]})
+    assert response.status_code == 200
+
+def test_stateless_requests_do_not_create_sessions():
+    client = server.app.test_client()
+    before = len(server.sessions)
+    response = client.post("/generate", json={"input": "hi", "max_tokens": 2})
+    assert response.status_code == 200
+    assert response.get_json()["session_id"] is None
+    assert len(server.sessions) == before
+
+def test_invalid_overrides_are_rejected():
+    client = server.app.test_client()
+    assert client.post("/generate", json={"input": "hi", "max_tokens": 0}).status_code == 400
+    assert client.post("/generate", json={"input": "hi", "temperature": "hot"}).status_code == 400
+
+def test_full_queue_is_refused_with_retry_after():
+    scheduler = server.scheduler
+    running = scheduler.submit([], "first", max_tokens=50)
+    deadline = time.time() + 5
+    while scheduler.waiting:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    queued = [scheduler.submit([], f"queued {i}", max_tokens=50) for i in range(scheduler.max_queue_depth)]
+    try:
+        with pytest.raises(server.QueueFull) as refused:
+            scheduler.submit([], "one too many")
+        assert refused.value.retry_after >= 1
+        response = server.app.test_client().post("/generate", json={"input": "hi"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+    finally:
+        for job in [running] + queued:
+            job.cancel()
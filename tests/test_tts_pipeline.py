@@ -0,0 +1,31 @@
+from tts_pipeline import SentenceSplitter
+
+def feed_all(splitter, text):
+    sentences = []
+    for word in text.split(" "):
+        sentences += splitter.feed(word + " ")
+    return sentences + splitter.flush()
+
+def test_splits_streamed_tokens_into_sentences():
+    splitter = SentenceSplitter()
+    assert feed_all(splitter, "The sky is blue. Sunsets are red! Why is that?") == [
+        "The sky is blue.", "Sunsets are red!", "Why is that?"]
+
+def test_sentence_is_held_until_it_ends():
+    splitter = SentenceSplitter()
+    assert splitter.feed("The sky is") == []
+    assert splitter.feed(" blue. And") == ["The sky is blue."]
+    assert splitter.flush() == ["And"]
+
+def test_short_fragments_join_the_next_sentence():
+    splitter = SentenceSplitter(min_chars=12)
+    assert feed_all(splitter, "Hi. How are you doing today?") == ["Hi. How are you doing today?"]
+
+def test_newlines_end_sentences():
+    splitter = SentenceSplitter()
+    assert splitter.feed("First line here\nsecond") == ["First line here"]
+    assert splitter.flush() == ["second"]
+
+def test_decimal_points_do_not_split():
+    splitter = SentenceSplitter()
+    assert feed_all(splitter, "It costs 3.50 dollars today.") == ["It costs 3.50 dollars today."]
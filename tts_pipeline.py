@@ -0,0 +1,142 @@
+import re
+import threading
+import time
+from collections import deque
+
+import pyttsx3
+
+from metrics import histogram, TRACER
+
+TTS_FIRST_AUDIO = histogram("pai_tts_first_audio_seconds", "Reply start to the first sentence being spoken")
+TTS_QUEUE_SECONDS = histogram("pai_tts_queue_seconds", "Time a sentence waited for the speaker")
+TTS_SPEAK_SECONDS = histogram("pai_tts_speak_seconds", "Time to speak one sentence")
+
+# A sentence ends at . ! ? (plus closing quotes/brackets) followed by whitespace, or at a newline
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|(?<=[.!?]["\')\]])\s+|\n+')
+
+# ---------------- SENTENCE SPLITTER ----------------
+class SentenceSplitter:
+    def __init__(self, min_chars=12):
+        self.min_chars = min_chars  # Short fragments like "Hi." are joined to the next sentence
+        self.buffer = ""
+        self.pending = ""
+
+    def feed(self, token):
+        self.buffer += token
+        parts = SENTENCE_BOUNDARY.split(self.buffer)
+        self.buffer = parts.pop()  # Still growing
+        sentences = []
+        for part in parts:
+            self.pending = f"{self.pending} {part.strip()}".strip()
+            if len(self.pending) >= self.min_chars:
+                sentences.append(self.pending)
+                self.pending = ""
+        return sentences
+
+    def flush(self):
+        rest = f"{self.pending} {self.buffer.strip()}".strip()
+        self.buffer = ""
+        self.pending = ""
+        return [rest] if rest else []
+
+# ---------------- SPEECH PIPELINE ----------------
+class SpeechPipeline(threading.Thread):
+    # Speaks a reply sentence by sentence while it is still being generated.
+    # begin() starts a reply and cancels whatever is still queued or playing,
+    # feed() takes streamed tokens and end() flushes the last sentence.
+    def __init__(self, log=None, rate=150, volume=1.0, max_pending=8, engine_factory=None, on_first_audio=None):
+        super().__init__(daemon=True)
+        self.log = log or (lambda text: None)
+        self.engine_factory = engine_factory or pyttsx3.init  # Anything with pyttsx3's say/runAndWait/stop
+        self.on_first_audio = on_first_audio or (lambda: None)
+        self.rate = rate
+        self.volume = volume
+        self.max_pending = max_pending
+        self.pending = deque()  # (generation, text, queued_at)
+        self.cond = threading.Condition()
+        self.splitter = SentenceSplitter()
+        self.generation = 0
+        self.reply_started = None
+        self.engine = None
+        self.speaking = False
+        self.running = True
+        self.start()
+
+    def run(self):
+        # pyttsx3 engines have to be driven from the thread that created them
+        self.engine = self.engine_factory()
+        self.engine.setProperty('rate', self.rate)
+        self.engine.setProperty('volume', self.volume)
+        while True:
+            with self.cond:
+                while self.running and not self.pending:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                generation, text, queued_at = self.pending.popleft()
+                if generation != self.generation:
+                    continue
+                self.speaking = True
+                started = time.time()
+                if self.reply_started is not None:
+                    TTS_FIRST_AUDIO.observe(started - self.reply_started)
+                    self.log(f"TTS: first audio {started - self.reply_started:.2f}s after reply start")
+                    self.on_first_audio()
+                    self.reply_started = None
+            try:
+                self.engine.say(text)
+                self.engine.runAndWait()
+            except Exception as e:
+                self.log(f"TTS error: {e}")
+            finally:
+                with self.cond:
+                    self.speaking = False
+            TTS_QUEUE_SECONDS.observe(started - queued_at)
+            TTS_SPEAK_SECONDS.observe(time.time() - started)
+            TRACER.record("tts.sentence", started, time.time() - started, chars=len(text))
+            self.log(f"TTS: sentence queued {started - queued_at:.2f}s, spoken in {time.time() - started:.2f}s ({len(text)} chars)")
+
+    def enqueue(self, sentences):
+        if not sentences:
+            return
+        with self.cond:
+            now = time.time()
+            for sentence in sentences:
+                # When the speaker falls behind, merge into the newest entry instead of growing the queue
+                if len(self.pending) >= self.max_pending:
+                    generation, text, queued_at = self.pending.pop()
+                    sentence = f"{text} {sentence}"
+                    now = queued_at
+                self.pending.append((self.generation, sentence, now))
+            self.cond.notify()
+
+    def cancel(self):
+        with self.cond:
+            self.generation += 1
+            self.pending.clear()
+            self.splitter = SentenceSplitter()
+            self.reply_started = None
+            if self.speaking and self.engine is not None:
+                self.engine.stop()
+
+    def begin(self):
+        self.cancel()
+        with self.cond:
+            self.reply_started = time.time()
+
+    def feed(self, token):
+        self.enqueue(self.splitter.feed(token))
+
+    def end(self):
+        self.enqueue(self.splitter.flush())
+
+    def say(self, text):
+        self.begin()
+        self.feed(text)
+        self.end()
+
+    def stop(self):
+        self.cancel()
+        with self.cond:
+            self.running = False
+            self.cond.notify()